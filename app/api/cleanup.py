@@ -0,0 +1,86 @@
+import asyncio
+from loguru import logger
+from typing import Any, Dict, List, Optional
+from app.redis_dao.custom_redis import SCAN_BATCH_SIZE
+from app.redis_dao.manager import redis_shards
+from app.redis_dao.shards import ShardedRedis
+
+# Пространства имен ключей приложения в Redis:
+#   room  - комнаты
+#   idx   - индексы ожидания и указатели пользователей на комнаты
+#   cache - кэш функций, обернутых в cached
+NAMESPACES = ("room", "idx", "cache")
+
+
+class NamespaceCleanup:
+    """
+    Фоновая очистка пространств имен Redis.
+
+    Пространства имен очищаются по одному: ключи перебираются через SCAN и
+    удаляются пачками через UNLINK, поэтому Redis продолжает обслуживать
+    живые чаты. Ход очистки доступен через status().
+    """
+
+    def __init__(self, shards: ShardedRedis, batch_size: int = SCAN_BATCH_SIZE):
+        self.shards = shards
+        self.batch_size = batch_size
+        self.namespace: Optional[str] = None
+        self.deleted: Dict[str, int] = {}
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def is_running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    def start(self, namespaces: List[str]) -> bool:
+        """Запускает очистку. Возвращает False, если очистка уже идет."""
+        if self.is_running:
+            return False
+        self.deleted = {namespace: 0 for namespace in namespaces}
+        self._task = asyncio.create_task(self._run(namespaces))
+        return True
+
+    async def stop(self):
+        """Прерывает очистку."""
+        if self.is_running:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            logger.info("Очистка Redis прервана")
+        self._task = None
+
+    def status(self) -> Dict[str, Any]:
+        """Текущее пространство имен и количество удаленных ключей по каждому."""
+        return {
+            "running": self.is_running,
+            "namespace": self.namespace,
+            "deleted": dict(self.deleted),
+        }
+
+    async def _run(self, namespaces: List[str]):
+        try:
+            for namespace in namespaces:
+                self.namespace = namespace
+                logger.info(f"Очистка пространства имен {namespace}: начата")
+                for redis_client in self.shards.clients():
+                    async for keys in redis_client.iter_key_batches(
+                        f"{namespace}:*", self.batch_size
+                    ):
+                        self.deleted[namespace] += await redis_client.unlink_keys(keys)
+                        logger.debug(
+                            f"Очистка пространства имен {namespace}: "
+                            f"удалено {self.deleted[namespace]} ключей"
+                        )
+                logger.info(
+                    f"Очистка пространства имен {namespace}: "
+                    f"удалено {self.deleted[namespace]} ключей"
+                )
+        except Exception as e:
+            logger.error(f"Ошибка при очистке Redis: {e}")
+        finally:
+            self.namespace = None
+
+
+redis_cleanup = NamespaceCleanup(redis_shards)
@@ -0,0 +1,259 @@
+from bisect import bisect_left, bisect_right, insort
+from collections import deque
+from itertools import count
+from typing import Deque, Dict, List, Optional, Tuple
+
+GENDERS = ("man", "woman")
+FIND_GENDERS = GENDERS + ("any",)
+# Верхняя граница возраста: индекс в памяти строится до нее, а в Redis все
+# старше нее попадают в последний возрастной диапазон шардов
+MAX_AGE = 120
+
+Bucket = Tuple[str, str]
+
+
+class Waiter:
+    """Ожидающий партнера пользователь."""
+
+    __slots__ = (
+        "user_id",
+        "gender",
+        "find_gender",
+        "age",
+        "age_from",
+        "age_to",
+        "room_key",
+        "seq",
+        "active",
+    )
+
+    def __init__(
+        self,
+        user_id: int,
+        gender: str,
+        find_gender: str,
+        age: int,
+        age_from: int,
+        age_to: int,
+        room_key: Optional[str],
+        seq: int,
+    ):
+        self.user_id = user_id
+        self.gender = gender
+        self.find_gender = find_gender
+        self.age = age
+        self.age_from = age_from
+        self.age_to = age_to
+        self.room_key = room_key
+        self.seq = seq
+        self.active = True
+
+
+class _BucketIndex:
+    """
+    Ожидающие одной пары (пол, искомый пол).
+
+    Ожидающий попадает в очередь queues[a][p] для своего возраста p и
+    каждого принимаемого им возраста партнера a. Для ищущего возраста a
+    достаточно просмотреть головы очередей queues[a][p] для p из его
+    диапазона: голова - самый давний ожидающий с таким возрастом.
+    Диапазоны за пределами [0, MAX_AGE] дополнительно хранятся в
+    очереди wide, которая просматривается только для ищущих вне этих границ.
+    """
+
+    __slots__ = ("queues", "ages", "wide")
+
+    def __init__(self):
+        self.queues: Dict[int, Dict[int, Deque[Waiter]]] = {}
+        self.ages: Dict[int, List[int]] = {}
+        self.wide: Deque[Waiter] = deque()
+
+    def add(self, waiter: Waiter):
+        first = max(waiter.age_from, 0)
+        last = min(waiter.age_to, MAX_AGE)
+        for accepted_age in range(first, last + 1):
+            by_age = self.queues.get(accepted_age)
+            if by_age is None:
+                by_age = self.queues[accepted_age] = {}
+                self.ages[accepted_age] = []
+            queue = by_age.get(waiter.age)
+            if queue is None:
+                queue = by_age[waiter.age] = deque()
+                insort(self.ages[accepted_age], waiter.age)
+            queue.append(waiter)
+        if waiter.age_from < 0 or waiter.age_to > MAX_AGE:
+            self.wide.append(waiter)
+
+    def oldest(
+        self, user_id: int, age: int, age_from: int, age_to: int
+    ) -> Optional[Waiter]:
+        """Самый давний ожидающий с возрастом в [age_from, age_to], которому подходит age."""
+        if not 0 <= age <= MAX_AGE:
+            return self._oldest_wide(user_id, age, age_from, age_to)
+
+        by_age = self.queues.get(age)
+        if by_age is None:
+            return None
+        ages = self.ages[age]
+        best = None
+        for partner_age in ages[
+            bisect_left(ages, age_from) : bisect_right(ages, age_to)
+        ]:
+            head = self._head(age, partner_age, by_age[partner_age], user_id)
+            if head is not None and (best is None or head.seq < best.seq):
+                best = head
+        return best
+
+    def _head(
+        self, age: int, partner_age: int, queue: Deque[Waiter], user_id: int
+    ) -> Optional[Waiter]:
+        # Удаленные ожидающие вычищаются лениво, когда оказываются в голове очереди
+        while queue and not queue[0].active:
+            queue.popleft()
+        if not queue:
+            self._drop_queue(age, partner_age)
+            return None
+        if queue[0].user_id != user_id:
+            return queue[0]
+        # Сам пользователь себе не пара: берем следующего активного
+        return next((w for w in queue if w.active and w.user_id != user_id), None)
+
+    def _drop_queue(self, age: int, partner_age: int):
+        del self.queues[age][partner_age]
+        ages = self.ages[age]
+        ages.pop(bisect_left(ages, partner_age))
+        if not ages:
+            del self.queues[age]
+            del self.ages[age]
+
+    def _oldest_wide(
+        self, user_id: int, age: int, age_from: int, age_to: int
+    ) -> Optional[Waiter]:
+        while self.wide and not self.wide[0].active:
+            self.wide.popleft()
+        return next(
+            (
+                w
+                for w in self.wide
+                if w.active
+                and w.user_id != user_id
+                and age_from <= w.age <= age_to
+                and w.age_from <= age <= w.age_to
+            ),
+            None,
+        )
+
+
+class MatchingEngine:
+    """
+    Индекс совместимости ожидающих пользователей в памяти процесса.
+
+    Ожидающие разложены по корзинам (пол, искомый пол), поэтому поиск
+    затрагивает не больше четырех корзин, совместимых по полу. Внутри корзины
+    просматриваются только головы очередей для возрастов из диапазона
+    ищущего, так что время поиска зависит от ширины диапазона, а не от числа
+    ожидающих. Из подходящих выбирается пришедший раньше всех. Добавление
+    стоит O(ширина принимаемого диапазона), удаление - O(1) с ленивой
+    очисткой очередей.
+
+    Условия совместимости совпадают с app.api.utils.is_match.
+    """
+
+    def __init__(self):
+        self._buckets: Dict[Bucket, _BucketIndex] = {}
+        self._waiters: Dict[int, Waiter] = {}
+        # Ключ комнаты ожидающего -> его user_id
+        self._rooms: Dict[str, int] = {}
+        self._seq = count()
+
+    def __len__(self) -> int:
+        return len(self._waiters)
+
+    def __contains__(self, user_id: int) -> bool:
+        return user_id in self._waiters
+
+    def add(
+        self,
+        user_id: int,
+        gender: str,
+        find_gender: str,
+        age: int,
+        age_from: int,
+        age_to: int,
+        room_key: Optional[str] = None,
+    ) -> Waiter:
+        """Ставит пользователя в очередь ожидания, заменяя прежнюю запись."""
+        self.remove(user_id)
+        waiter = Waiter(
+            user_id,
+            gender,
+            find_gender,
+            age,
+            age_from,
+            age_to,
+            room_key,
+            next(self._seq),
+        )
+        self._waiters[user_id] = waiter
+        if room_key is not None:
+            self._rooms[room_key] = user_id
+        self._buckets.setdefault((gender, find_gender), _BucketIndex()).add(waiter)
+        return waiter
+
+    def remove(self, user_id: int) -> bool:
+        """Убирает пользователя из ожидания. Возвращает True, если он ожидал."""
+        waiter = self._waiters.pop(user_id, None)
+        if waiter is None:
+            return False
+        waiter.active = False
+        if waiter.room_key is not None:
+            self._rooms.pop(waiter.room_key, None)
+        return True
+
+    def remove_room(self, room_key: str) -> bool:
+        """Убирает из ожидания владельца комнаты. Возвращает True, если он ожидал."""
+        user_id = self._rooms.get(room_key)
+        return user_id is not None and self.remove(user_id)
+
+    def clear(self):
+        """Убирает из ожидания всех."""
+        self._buckets.clear()
+        self._waiters.clear()
+        self._rooms.clear()
+
+    def find(
+        self,
+        user_id: int,
+        gender: str,
+        find_gender: str,
+        age: int,
+        age_from: int,
+        age_to: int,
+    ) -> Optional[Waiter]:
+        """Возвращает самого давнего совместимого ожидающего, не убирая его."""
+        partner_genders = GENDERS if find_gender == "any" else (find_gender,)
+        best = None
+        for partner_gender in partner_genders:
+            for partner_find_gender in (gender, "any"):
+                bucket = self._buckets.get((partner_gender, partner_find_gender))
+                if bucket is None:
+                    continue
+                candidate = bucket.oldest(user_id, age, age_from, age_to)
+                if candidate is not None and (best is None or candidate.seq < best.seq):
+                    best = candidate
+        return best
+
+    def pop_match(
+        self,
+        user_id: int,
+        gender: str,
+        find_gender: str,
+        age: int,
+        age_from: int,
+        age_to: int,
+    ) -> Optional[Waiter]:
+        """Находит самого давнего совместимого ожидающего и убирает его из ожидания."""
+        waiter = self.find(user_id, gender, find_gender, age, age_from, age_to)
+        if waiter is not None:
+            self.remove(waiter.user_id)
+        return waiter
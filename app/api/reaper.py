@@ -0,0 +1,48 @@
+import asyncio
+from loguru import logger
+from typing import Optional
+from app.api.rooms import reap_waiting_rooms
+from app.config import settings
+from app.metrics.metrics import ROOMS_CLOSED
+from app.redis_dao.manager import redis_shards
+from app.redis_dao.shards import ShardedRedis
+
+
+class RoomReaper:
+    """Фоновая задача, периодически вычищающая истекшие комнаты из индексов ожидания."""
+
+    def __init__(self, shards: ShardedRedis, interval: float = 60):
+        self.shards = shards
+        self.interval = interval
+        self._task: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Запускает фоновую задачу."""
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+            logger.info(f"Очистка комнат запущена с интервалом {self.interval} сек")
+
+    async def stop(self):
+        """Останавливает фоновую задачу."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+            logger.info("Очистка комнат остановлена")
+
+    async def _run(self):
+        while True:
+            await asyncio.sleep(self.interval)
+            try:
+                reclaimed = await reap_waiting_rooms(self.shards)
+                ROOMS_CLOSED.labels("expired").inc(reclaimed)
+                if reclaimed:
+                    logger.info(f"Из индексов ожидания удалено {reclaimed} истекших комнат")
+            except Exception as e:
+                logger.error(f"Ошибка при очистке комнат: {e}")
+
+
+room_reaper = RoomReaper(redis_shards, interval=settings.ROOM_REAPER_INTERVAL)
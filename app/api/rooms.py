@@ -0,0 +1,709 @@
+import asyncio
+import json
+import uuid
+from datetime import datetime
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+from loguru import logger
+from redis.exceptions import ResponseError
+from app.api.scripts import (
+    CLAIM_ROOM,
+    CREATE_ROOM,
+    DELETE_ROOM,
+    FIND_OLDEST_ROOM,
+    MATCH_OR_CREATE_ROOM,
+    MIGRATE_ROOM,
+    ROOM_PREFIX,
+    get_script,
+)
+from app.api.matching import FIND_GENDERS, GENDERS, MAX_AGE, MatchingEngine
+from app.api.utils import notify_matched
+from app.config import settings
+from app.metrics.metrics import MATCHES, ROOMS_CLOSED, ROOMS_CREATED
+from app.redis_dao.custom_redis import SCAN_BATCH_SIZE, CustomRedis
+from app.redis_dao.shards import ShardedRedis
+
+WAITING_INDEX_PREFIX = "idx:waiting:"
+USER_ROOM_PREFIX = "idx:user:"
+
+# Индекс ожидающих для MATCH_ENGINE="memory"
+matching_engine = MatchingEngine()
+_memory_match_lock = asyncio.Lock()
+
+
+def age_band(age: int) -> int:
+    """Номер возрастного диапазона шарда."""
+    return min(max(age, 0), MAX_AGE) // settings.MATCH_AGE_BAND
+
+
+def waiting_index_key(gender: str, find_gender: str, band: int) -> str:
+    """
+    Ключ шарда индекса ожидающих комнат.
+
+    Шард определяется полом ожидающего, искомым им полом и его возрастным
+    диапазоном.
+    """
+    return f"{WAITING_INDEX_PREFIX}{gender}:{find_gender}:{band}"
+
+
+def room_redis_key(room_key: str) -> str:
+    """
+    Ключ Redis, под которым хранится комната.
+
+    Сам ключ комнаты остается без префикса: он же служит именем канала
+    Centrifugo, где двоеточие отделяет пространство имен канала.
+    """
+    return f"{ROOM_PREFIX}{room_key}"
+
+
+def room_key_of(redis_key: bytes) -> str:
+    """Ключ комнаты по ее ключу Redis."""
+    return redis_key.decode()[len(ROOM_PREFIX) :]
+
+
+def user_room_key(user_id: int) -> str:
+    """Ключ, хранящий комнату, в которой сейчас находится пользователь."""
+    return f"{USER_ROOM_PREFIX}{user_id}"
+
+
+def candidate_index_keys(
+    user_gender: str, find_gender: str, age_from: int, age_to: int
+) -> List[str]:
+    """
+    Возвращает ключи шардов, в которых могут находиться подходящие партнеры.
+
+    Если диапазон возраста захватывает несколько возрастных диапазонов,
+    возвращаются шарды всех этих диапазонов.
+
+    :param user_gender: Пол текущего пользователя.
+    :param find_gender: Пол, который ищет текущий пользователь.
+    :param age_from: Минимальный возраст партнера.
+    :param age_to: Максимальный возраст партнера.
+    :return: Список ключей индексов.
+    """
+    partner_genders = GENDERS if find_gender == "any" else (find_gender,)
+    return [
+        waiting_index_key(partner_gender, partner_find_gender, band)
+        for partner_gender in partner_genders
+        for partner_find_gender in (user_gender, "any")
+        for band in range(age_band(age_from), age_band(age_to) + 1)
+    ]
+
+
+def all_index_keys() -> List[str]:
+    """Возвращает ключи всех шардов индекса ожидания."""
+    return [
+        waiting_index_key(gender, find_gender, band)
+        for gender in GENDERS
+        for find_gender in FIND_GENDERS
+        for band in range(age_band(MAX_AGE) + 1)
+    ]
+
+
+def new_room_key(shards: ShardedRedis, find_gender: str, node: str) -> str:
+    """
+    Генерирует ключ комнаты, принадлежащий узлу node.
+
+    Комната должна лежать на одном узле со своим шардом индекса, чтобы ее
+    можно было занять атомарно. Формат ключа при этом не меняется.
+    """
+    while True:
+        room_key = f"{find_gender}_{uuid.uuid4().hex[:10]}"
+        if shards.is_single or shards.node_for(room_redis_key(room_key)) == node:
+            return room_key
+
+
+async def match_or_create_room(
+    shards: ShardedRedis,
+    user_id: int,
+    user_nickname: str,
+    user_gender: str,
+    user_age: int,
+    find_gender: str,
+    age_from: int,
+    age_to: int,
+    user_token: str,
+) -> Tuple[str, str, int]:
+    """
+    Подбирает пользователю комнату.
+
+    Если пользователь уже находится в комнате, она возвращается без изменений.
+    Иначе пользователь занимает самую старую подходящую ожидающую комнату,
+    а если такой нет - создается новая. При входе в комнату ожидающий
+    партнер получает событие "matched" через Centrifugo.
+
+    На одном узле Redis все делается одним Lua-скриптом за один запрос. Если
+    шарды распределены по нескольким узлам, кандидаты ищутся на всех узлах
+    параллельно, а самая старая комната занимается отдельным атомарным
+    скриптом на своем узле; при гонке поиск повторяется.
+
+    При MATCH_ENGINE="memory" партнер ищется в индексе MatchingEngine в
+    памяти процесса, а Redis только хранит комнаты. Так можно запускать
+    API только одним процессом.
+
+    :return: Кортеж (результат, ключ комнаты, количество участников), где
+        результат - "refund", "matched" или "waiting".
+    """
+    user = json.dumps(
+        {
+            "id": user_id,
+            "nickname": user_nickname,
+            "gender": user_gender,
+            "age": user_age,
+            "find_gender": find_gender,
+            "age_from": age_from,
+            "age_to": age_to,
+            "token": user_token,
+        }
+    )
+    own_index = waiting_index_key(user_gender, find_gender, age_band(user_age))
+    index_keys = candidate_index_keys(user_gender, find_gender, age_from, age_to)
+    created_at = datetime.now().isoformat()
+
+    if settings.MATCH_ENGINE == "memory":
+        result, room_key, partners_count, partner = await _match_in_memory(
+            shards,
+            user_id,
+            user,
+            user_gender,
+            user_age,
+            find_gender,
+            age_from,
+            age_to,
+            own_index,
+            created_at,
+        )
+    elif shards.is_single:
+        redis_client = shards.client_for(own_index)
+        script = get_script(redis_client, MATCH_OR_CREATE_ROOM)
+        result, room_key, partners_count, *partner = await script(
+            keys=[user_room_key(user_id), own_index, *index_keys],
+            args=[
+                user,
+                new_room_key(shards, find_gender, shards.node_for(own_index)),
+                created_at,
+                settings.ROOM_TTL,
+            ],
+            client=redis_client,
+        )
+        result, room_key = result.decode(), room_key.decode()
+    else:
+        result, room_key, partners_count, partner = await _match_across_nodes(
+            shards, user_id, user, find_gender, own_index, index_keys, created_at
+        )
+
+    if result == "waiting":
+        ROOMS_CREATED.inc()
+    elif result == "matched":
+        MATCHES.inc()
+        partner_id, partner_nickname = partner
+        notify_matched(
+            room_key,
+            [
+                {"id": partner_id, "nickname": partner_nickname.decode()},
+                {"id": user_id, "nickname": user_nickname},
+            ],
+        )
+    return result, room_key, partners_count
+
+
+async def _match_across_nodes(
+    shards: ShardedRedis,
+    user_id: int,
+    user: str,
+    find_gender: str,
+    own_index: str,
+    index_keys: List[str],
+    created_at: str,
+) -> Tuple[str, str, int, list]:
+    current = await _current_room(shards, user_id)
+    if current:
+        return current
+
+    index_groups = shards.group_by_node(index_keys)
+    for _ in range(settings.MATCH_CLAIM_RETRIES):
+        candidates = await asyncio.gather(
+            *(
+                _find_oldest(shards.client(node), keys, user)
+                for node, keys in index_groups.items()
+            )
+        )
+        candidates = [candidate for candidate in candidates if candidate]
+        if not candidates:
+            break
+        room_key, _ = min(candidates, key=lambda candidate: candidate[1])
+        partner = await _claim_room(shards, user_id, user, room_key)
+        if partner:
+            return "matched", room_key, 2, partner
+        # Комнату успели занять: ищем заново
+
+    room_key = await _create_room(
+        shards, user_id, user, find_gender, own_index, created_at
+    )
+    return "waiting", room_key, 1, []
+
+
+async def _match_in_memory(
+    shards: ShardedRedis,
+    user_id: int,
+    user: str,
+    user_gender: str,
+    user_age: int,
+    find_gender: str,
+    age_from: int,
+    age_to: int,
+    own_index: str,
+    created_at: str,
+) -> Tuple[str, str, int, list]:
+    # Поиск и постановка в очередь не должны чередоваться между запросами,
+    # иначе два подходящих друг другу пользователя могут оба остаться ждать.
+    # Блокировка держится на время обращений к Redis: это ограничивает
+    # пропускную способность (см. MATCH_ENGINE в app/config.py)
+    async with _memory_match_lock:
+        current = await _current_room(shards, user_id)
+        if current:
+            return current
+
+        while True:
+            waiter = matching_engine.pop_match(
+                user_id, user_gender, find_gender, user_age, age_from, age_to
+            )
+            if waiter is None:
+                break
+            partner = await _claim_room(shards, user_id, user, waiter.room_key)
+            if partner:
+                return "matched", waiter.room_key, 2, partner
+            # Комната истекла или удалена: берем следующего ожидающего
+
+        room_key = await _create_room(
+            shards, user_id, user, find_gender, own_index, created_at
+        )
+        matching_engine.add(
+            user_id, user_gender, find_gender, user_age, age_from, age_to, room_key
+        )
+        return "waiting", room_key, 1, []
+
+
+async def _current_room(
+    shards: ShardedRedis, user_id: int
+) -> Optional[Tuple[str, str, int, list]]:
+    """Текущая комната пользователя, если он еще в ней; продлевает ее жизнь."""
+    pointer_key = user_room_key(user_id)
+    current_key = await shards.client_for(pointer_key).get(pointer_key)
+    if not current_key:
+        return None
+    current_key = room_key_of(current_key)
+    current = await get_room_summary(shards, current_key)
+    if current and any(p["id"] == user_id for p in current["partners"]):
+        await touch_room(shards, current_key, user_id)
+        return "refund", current_key, current["count"], []
+    return None
+
+
+async def _claim_room(
+    shards: ShardedRedis, user_id: int, user: str, room_key: str
+) -> Optional[list]:
+    """Занимает ожидающую комнату; возвращает id и никнейм партнера или None."""
+    redis_key = room_redis_key(room_key)
+    room_client = shards.client_for(redis_key)
+    script = get_script(room_client, CLAIM_ROOM)
+    partner = await script(
+        keys=[redis_key], args=[user, settings.ROOM_TTL], client=room_client
+    )
+    if not partner:
+        return None
+    pointer_key = user_room_key(user_id)
+    await shards.client_for(pointer_key).set(
+        pointer_key, redis_key, ex=settings.ROOM_TTL
+    )
+    return partner
+
+
+async def _create_room(
+    shards: ShardedRedis,
+    user_id: int,
+    user: str,
+    find_gender: str,
+    own_index: str,
+    created_at: str,
+) -> str:
+    """Создает ожидающую комнату на узле индекса own_index; возвращает ее ключ."""
+    node = shards.node_for(own_index)
+    room_key = new_room_key(shards, find_gender, node)
+    redis_key = room_redis_key(room_key)
+    room_client = shards.client(node)
+    script = get_script(room_client, CREATE_ROOM)
+    await script(
+        keys=[redis_key, own_index],
+        args=[user, created_at, settings.ROOM_TTL],
+        client=room_client,
+    )
+    pointer_key = user_room_key(user_id)
+    await shards.client_for(pointer_key).set(
+        pointer_key, redis_key, ex=settings.ROOM_TTL
+    )
+    return room_key
+
+
+async def _find_oldest(
+    redis_client: CustomRedis, index_keys: List[str], user: str
+) -> Optional[Tuple[str, bytes]]:
+    script = get_script(redis_client, FIND_OLDEST_ROOM)
+    found = await script(keys=index_keys, args=[user], client=redis_client)
+    if not found:
+        return None
+    room_key, created_at = found
+    return room_key.decode(), created_at
+
+
+async def touch_room(shards: ShardedRedis, room_key: str, *user_ids: int):
+    """Продлевает время жизни комнаты и указателей ее участников."""
+    keys = [
+        room_redis_key(room_key),
+        *(user_room_key(user_id) for user_id in user_ids),
+    ]
+    for node, node_keys in shards.group_by_node(keys).items():
+        await shards.client(node).run_pipeline(
+            ("EXPIRE", key, settings.ROOM_TTL) for key in node_keys
+        )
+
+
+async def delete_room(shards: ShardedRedis, room_key: str):
+    """Удаляет комнату вместе с ее записью в индексе ожидания."""
+    redis_key = room_redis_key(room_key)
+    redis_client = shards.client_for(redis_key)
+    script = get_script(redis_client, DELETE_ROOM)
+    matching_engine.remove_room(room_key)
+    if await script(keys=[redis_key], client=redis_client):
+        ROOMS_CLOSED.labels("cleared").inc()
+
+
+async def reap_waiting_rooms(shards: ShardedRedis, batch_size: int = 500) -> int:
+    """
+    Удаляет из индексов ожидания комнаты, ключи которых уже истекли.
+
+    :param shards: Узлы Redis.
+    :param batch_size: Сколько элементов индекса проверять за один запрос.
+    :return: Количество удаленных из индексов комнат.
+    """
+    reclaimed = 0
+    for index_key in all_index_keys():
+        redis_client = shards.client_for(index_key)
+        batch = []
+        async for room_key, _ in redis_client.zscan_iter(index_key, count=batch_size):
+            batch.append(room_key)
+            if len(batch) >= batch_size:
+                reclaimed += await _unindex_missing(redis_client, index_key, batch)
+                batch = []
+        if batch:
+            reclaimed += await _unindex_missing(redis_client, index_key, batch)
+    return reclaimed
+
+
+async def count_waiting_rooms(shards: ShardedRedis) -> Dict[Tuple[str, str], int]:
+    """
+    Считает ожидающие комнаты по паре (пол, искомый пол) во всех шардах.
+
+    :return: Словарь {(пол, искомый пол): количество}.
+    """
+    counts = {}
+    for node, index_keys in shards.group_by_node(all_index_keys()).items():
+        sizes = await shards.client(node).run_pipeline(
+            ("ZCARD", index_key) for index_key in index_keys
+        )
+        for index_key, size in zip(index_keys, sizes):
+            gender, find_gender, _ = index_key[len(WAITING_INDEX_PREFIX) :].split(":")
+            counts[gender, find_gender] = counts.get((gender, find_gender), 0) + size
+    return counts
+
+
+async def fill_matching_engine(shards: ShardedRedis, batch_size: int = 500) -> int:
+    """
+    Заполняет matching_engine ожидающими комнатами из индексов Redis.
+
+    Нужно при MATCH_ENGINE="memory" после перезапуска процесса: ожидающие
+    комнаты переживают его в Redis, а индекс в памяти - нет. Ожидающие
+    добавляются в порядке создания комнат, чтобы сохранить очередность.
+
+    :return: Количество добавленных ожидающих.
+    """
+    fields = (
+        "count",
+        "created_at",
+        "room_key",
+        "p1:id",
+        "p1:gender",
+        "p1:find_gender",
+        "p1:age",
+        "p1:age_from",
+        "p1:age_to",
+    )
+    waiting = []
+    for index_key in all_index_keys():
+        redis_client = shards.client_for(index_key)
+        batch = []
+        async for room_key, _ in redis_client.zscan_iter(index_key, count=batch_size):
+            batch.append(room_key)
+        for start in range(0, len(batch), batch_size):
+            rooms = await redis_client.run_pipeline(
+                ("HMGET", room_key, *fields)
+                for room_key in batch[start : start + batch_size]
+            )
+            waiting.extend(room for room in rooms if room[0] == b"1")
+
+    matching_engine.clear()
+    for _, created_at, room_key, *partner in sorted(waiting, key=lambda room: room[1]):
+        user_id, gender, find_gender, age, age_from, age_to = partner
+        matching_engine.add(
+            int(user_id),
+            gender.decode(),
+            find_gender.decode(),
+            int(age),
+            int(age_from),
+            int(age_to),
+            room_key.decode(),
+        )
+    return len(waiting)
+
+
+async def _unindex_missing(
+    redis_client: CustomRedis, index_key: str, room_keys: List[bytes]
+) -> int:
+    exists = await redis_client.run_pipeline(
+        ("EXISTS", room_key) for room_key in room_keys
+    )
+    missing = [key for key, found in zip(room_keys, exists) if not found]
+    if missing:
+        await redis_client.zrem(index_key, *missing)
+        for key in missing:
+            matching_engine.remove_room(room_key_of(key))
+    return len(missing)
+
+
+async def get_room_summary(
+    shards: ShardedRedis, room_key: str
+) -> Optional[Dict[str, Any]]:
+    """
+    Возвращает количество участников комнаты и их id и никнеймы.
+
+    Читаются только нужные поля хэша комнаты, без полных профилей и токенов.
+
+    :return: Словарь {"count": ..., "partners": [...]} или None, если комнаты нет.
+    """
+    redis_key = room_redis_key(room_key)
+    redis_client = shards.client_for(redis_key)
+    fields = ("count", "p1:id", "p1:nickname", "p2:id", "p2:nickname")
+    try:
+        values = await redis_client.hmget(redis_key, fields)
+    except ResponseError:
+        # Комната еще хранится в старом формате JSON
+        await migrate_room(redis_client, redis_key)
+        values = await redis_client.hmget(redis_key, fields)
+
+    count, *partner_values = values
+    if count is None:
+        return None
+    partners = [
+        {"id": int(partner_id), "nickname": nickname.decode()}
+        for partner_id, nickname in zip(partner_values[::2], partner_values[1::2])
+        if partner_id is not None
+    ]
+    return {"count": int(count), "partners": partners}
+
+
+async def migrate_room(redis_client: CustomRedis, key) -> bool:
+    """
+    Переводит комнату из строки JSON в хэш. Возвращает True, если перевод был.
+
+    Комнаты, записанные без TTL, получают ROOM_TTL.
+    """
+    script = get_script(redis_client, MIGRATE_ROOM)
+    return bool(await script(keys=[key], args=[settings.ROOM_TTL], client=redis_client))
+
+
+async def migrate_json_rooms(shards: ShardedRedis) -> int:
+    """
+    Переводит все комнаты, сохраненные строками JSON, в хэши.
+
+    :return: Количество переведенных комнат.
+    """
+    migrated = 0
+    for redis_client in shards.clients():
+        for find_gender in FIND_GENDERS:
+            async for room_key in redis_client.iter_keys(
+                f"{find_gender}_*", key_type="STRING"
+            ):
+                migrated += await migrate_room(redis_client, room_key)
+    if migrated:
+        logger.info(f"Переведено в хэши {migrated} комнат в формате JSON")
+    return migrated
+
+
+async def migrate_unsharded_indexes(shards: ShardedRedis) -> int:
+    """
+    Переносит ожидающие комнаты из индексов idx:waiting:<пол>:<искомый пол>
+    без разбиения на шарды в шарды по возрастным диапазонам.
+
+    :return: Количество перенесенных комнат.
+    """
+    moved = 0
+    for redis_client in shards.clients():
+        for gender in GENDERS:
+            for find_gender in FIND_GENDERS:
+                old_key = f"{WAITING_INDEX_PREFIX}{gender}:{find_gender}"
+                async for room_key, age in redis_client.zscan_iter(old_key):
+                    index_key = waiting_index_key(
+                        gender, find_gender, age_band(int(age))
+                    )
+                    await shards.client_for(index_key).zadd(index_key, {room_key: age})
+                    room_client = shards.client_for(room_key.decode())
+                    if await room_client.exists(room_key):
+                        await room_client.hset(room_key, "index", index_key)
+                    moved += 1
+                await redis_client.unlink(old_key)
+    if moved:
+        logger.info(f"Перенесено в шарды {moved} ожидающих комнат")
+    return moved
+
+
+async def migrate_room_namespace(
+    shards: ShardedRedis, batch_size: int = SCAN_BATCH_SIZE
+) -> int:
+    """
+    Переносит комнаты, хранящиеся под ключами без пространства имен,
+    в room:<ключ комнаты>.
+
+    Вместе с комнатой обновляются ее запись в индексе ожидания и указатели
+    пользователей. Ожидающая комната, которая после переноса оказалась не на
+    одном узле со своим индексом, убирается из индекса: занять ее атомарно
+    уже нельзя.
+
+    :return: Количество перенесенных комнат.
+    """
+    moved = 0
+    for node in shards.nodes:
+        redis_client = shards.client(node)
+        for find_gender in FIND_GENDERS:
+            async for old_key in redis_client.iter_keys(f"{find_gender}_*", batch_size):
+                if not await redis_client.exists(old_key):
+                    continue
+                await migrate_room(redis_client, old_key)
+                new_key = room_redis_key(old_key.decode())
+                index_key = await redis_client.hget(old_key, "index")
+                await _move_key(shards, node, old_key, new_key)
+                if index_key:
+                    await _reindex_room(shards, index_key.decode(), old_key, new_key)
+                moved += 1
+
+        async for pointer_key in redis_client.iter_keys(
+            f"{USER_ROOM_PREFIX}*", batch_size
+        ):
+            room_key = await redis_client.get(pointer_key)
+            if room_key and not room_key.startswith(ROOM_PREFIX.encode()):
+                await redis_client.set(
+                    pointer_key, room_redis_key(room_key.decode()), keepttl=True
+                )
+    if moved:
+        logger.info(f"Перенесено в пространство имен {ROOM_PREFIX} {moved} комнат")
+    return moved
+
+
+async def _move_key(shards: ShardedRedis, node: str, old_key: bytes, new_key: str):
+    redis_client = shards.client(node)
+    new_node = shards.node_for(new_key)
+    if new_node == node:
+        await redis_client.rename(old_key, new_key)
+        return
+    ttl = await redis_client.pttl(old_key)
+    dump = await redis_client.dump(old_key)
+    await shards.client(new_node).restore(new_key, max(ttl, 0), dump, replace=True)
+    await redis_client.unlink(old_key)
+
+
+async def _reindex_room(
+    shards: ShardedRedis, index_key: str, old_key: bytes, new_key: str
+):
+    index_client = shards.client_for(index_key)
+    score = await index_client.zscore(index_key, old_key)
+    if score is None:
+        return
+    await index_client.zrem(index_key, old_key)
+    if shards.node_for(index_key) == shards.node_for(new_key):
+        await index_client.zadd(index_key, {new_key: score})
+
+
+async def index_legacy_rooms(
+    shards: ShardedRedis, batch_size: int = SCAN_BATCH_SIZE
+) -> int:
+    """
+    Доводит до текущего формата комнаты, созданные до индексов и TTL.
+
+    Такие комнаты записывались без TTL и не попадали в индекс ожидания:
+    ожидающую комнату никто не мог занять, и она жила вечно. Комната без
+    TTL получает ROOM_TTL, а ожидающая комната без поля index добавляется
+    в шард индекса и запоминает его. Если шард лежит на другом узле, занять
+    комнату атомарно нельзя: она остается вне индекса и просто истечет.
+
+    :return: Количество добавленных в индекс комнат.
+    """
+    indexed = 0
+    for node in shards.nodes:
+        redis_client = shards.client(node)
+        async for redis_key in redis_client.iter_keys(
+            f"{ROOM_PREFIX}*", batch_size, key_type="HASH"
+        ):
+            if await redis_client.ttl(redis_key) == -1:
+                await redis_client.expire(redis_key, settings.ROOM_TTL)
+            count, index_key, gender, find_gender, age = await redis_client.hmget(
+                redis_key, "count", "index", "p1:gender", "p1:find_gender", "p1:age"
+            )
+            if count != b"1" or index_key or age is None:
+                continue
+            index_key = waiting_index_key(
+                gender.decode(), find_gender.decode(), age_band(int(age))
+            )
+            if shards.node_for(index_key) != node:
+                continue
+            await redis_client.run_pipeline(
+                [
+                    ("HSET", redis_key, "index", index_key),
+                    ("ZADD", index_key, int(age), redis_key),
+                ]
+            )
+            indexed += 1
+    if indexed:
+        logger.info(f"Добавлено в индексы ожидания {indexed} старых комнат")
+    return indexed
+
+
+# Множество имен уже выполненных разовых миграций данных в Redis
+MIGRATIONS_KEY = "meta:migrations"
+
+# Разовые миграции в порядке выполнения: (имя, функция)
+MIGRATIONS: List[Tuple[str, Callable[[ShardedRedis], Awaitable[int]]]] = [
+    ("json_rooms", migrate_json_rooms),
+    ("unsharded_indexes", migrate_unsharded_indexes),
+    ("room_namespace", migrate_room_namespace),
+    ("legacy_rooms", index_legacy_rooms),
+]
+
+
+async def run_migrations(shards: ShardedRedis) -> List[str]:
+    """
+    Выполняет разовые миграции, которые еще не отмечены в MIGRATIONS_KEY.
+
+    Каждая миграция перебирает ключи всех узлов, поэтому после успешного
+    выполнения она отмечается и при следующих запусках пропускается.
+
+    :return: Имена выполненных миграций.
+    """
+    redis_client = shards.client_for(MIGRATIONS_KEY)
+    done = await redis_client.smembers(MIGRATIONS_KEY)
+    applied = []
+    for name, migration in MIGRATIONS:
+        if name.encode() in done:
+            continue
+        await migration(shards)
+        await redis_client.sadd(MIGRATIONS_KEY, name)
+        applied.append(name)
+        logger.info(f"Миграция {name} выполнена")
+    return applied
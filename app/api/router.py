@@ -1,31 +1,32 @@
-import json
+from typing import Optional
 from fastapi import APIRouter, Depends, HTTPException
 from sqlalchemy.ext.asyncio import AsyncSession
 from app.api.schemas import SPartner, SMessge
-from app.api.utils import (
-    send_msg,
-    create_new_room,
-    get_user_info,
-    get_all_rooms_gender,
-    add_user_to_room,
-    refund_partner,
-    is_match,
+from app.api.cleanup import NAMESPACES, redis_cleanup
+from app.api.rooms import (
+    match_or_create_room,
+    get_room_summary,
+    touch_room,
+    delete_room,
 )
+from app.api.utils import send_msg, get_user_info, get_client_token, room_response
 from app.dao.fastapi_dao_dep import get_session_without_commit
-from app.redis_dao.custom_redis import CustomRedis
-from app.redis_dao.manager import get_redis
+from app.metrics.metrics import timed
+from app.redis_dao.manager import get_redis_shards
+from app.redis_dao.shards import ShardedRedis
 
 router = APIRouter(prefix="/api", tags=["АПИ"])
 
 
 @router.post("/find-partner")
+@timed("find_partner")
 async def find_partner(
     user: SPartner,
     session: AsyncSession = Depends(get_session_without_commit),
-    redis_client: CustomRedis = Depends(get_redis),
+    shards: ShardedRedis = Depends(get_redis_shards),
 ):
     # Получаем полные данные пользователя
-    user_data = await get_user_info(session, user.id)
+    user_data = await get_user_info(session=session, user_id=user.id)
 
     # Данные пользователя
     user_nickname = user_data["nickname"]
@@ -37,92 +38,50 @@ async def find_partner(
     age_to = user.age_to
     find_gender = user.gender
 
-    # Получаем все комнаты для искомого пола
-    all_rooms = await get_all_rooms_gender(redis_client)
-
-    if len(all_rooms) == 0:
-        # Если нет подходящих комнат, создаем новую
-        return await create_new_room(
-            user_id=user.id,
-            user_nickname=user_nickname,
-            user_gender=user_gender,
-            user_age=user_age,
-            find_gender=user.gender,
-            age_from=age_from,
-            age_to=age_to,
-            redis_client=redis_client,
-        )
-    else:
-        # Ищем подходящую комнату
-        for room in all_rooms:
-            partners = room.get("partners", [])
-            if len(partners) == 1:
-                partner_data = partners[0]
-                if partner_data["id"] != user.id:
-                    if is_match(
-                        user_gender=user_gender,
-                        user_find_gender=find_gender,
-                        user_age=user_age,
-                        user_age_from=age_from,
-                        user_age_to=age_to,
-                        partner_gender=partner_data.get("gender"),
-                        partner_find_gender=partner_data.get("find_gender"),
-                        partner_age=partner_data.get("age"),
-                        partner_age_from=partner_data.get("age_from"),
-                        partner_age_to=partner_data.get("age_to"),
-                    ):
-                        return await add_user_to_room(
-                            room,
-                            user.id,
-                            user_nickname,
-                            user_gender,
-                            user_age,
-                            find_gender,
-                            age_from,
-                            age_to,
-                            redis_client,
-                        )
-                else:
-                    return await refund_partner(
-                        room.get("room_key"),
-                        user.id,
-                        user_nickname,
-                        status="waiting",
-                        message="Ожидаем подходящего партнера",
-                    )
-            elif len(partners) == 2:
-                if partners[0]["id"] == user.id or partners[1]["id"] == user.id:
-                    return await refund_partner(
-                        room.get("room_key"), user.id, user_nickname
-                    )
-            continue
-        # Если подходящая комната не найдена, создаем новую
-        return await create_new_room(
-            user_id=user.id,
-            user_nickname=user_nickname,
-            user_gender=user_gender,
-            user_age=user_age,
-            find_gender=user.gender,
-            age_from=age_from,
-            age_to=age_to,
-            redis_client=redis_client,
-        )
+    user_token = get_client_token(user.id)
+
+    # Подбор партнера и занятие комнаты выполняются атомарно в Redis
+    result, room_key, partners_count = await match_or_create_room(
+        shards,
+        user_id=user.id,
+        user_nickname=user_nickname,
+        user_gender=user_gender,
+        user_age=user_age,
+        find_gender=find_gender,
+        age_from=age_from,
+        age_to=age_to,
+        user_token=user_token,
+    )
+
+    if partners_count == 2:
+        return room_response(room_key, user.id, user_nickname, user_token)
+    return room_response(
+        room_key,
+        user.id,
+        user_nickname,
+        user_token,
+        status="waiting",
+        message="Ожидаем подходящего партнера",
+    )
 
 
 @router.get("/room-status")
+@timed("room_status")
 async def room_status(
-    key: str, user_id: int, redis_client: CustomRedis = Depends(get_redis)
+    key: str, user_id: int, shards: ShardedRedis = Depends(get_redis_shards)
 ):
-    # Получаем данные о комнате из Redis
-    room_data = await redis_client.get(key)
-    if not room_data:
+    # Резервный способ узнать статус комнаты (например, после переподключения):
+    # о найденном партнере клиенты узнают из события "matched" в канале комнаты
+    # Получаем из Redis только количество участников и их никнеймы
+    room_info = await get_room_summary(shards, key)
+    if not room_info:
         raise HTTPException(status_code=404, detail="Комната не найдена")
 
-    room_info = json.loads(room_data)
-    participants = room_info.get("partners", [])
+    participants = room_info["partners"]
+    await touch_room(shards, key, *(p["id"] for p in participants))
 
     # Если в комнате 2 участника, значит партнер найден
-    if len(participants) == 2:
+    if room_info["count"] == 2:
         # Находим партнера (не текущего пользователя)
         partner = next(
             (
@@ -142,7 +101,7 @@ async def room_status(
         }
 
     # Если в комнате только один участник, значит ожидание
-    elif len(participants) == 1:
+    elif room_info["count"] == 1:
         print(f"STATUS: waiting!")
         return {
             "room_key": key,
@@ -157,21 +116,46 @@ async def room_status(
 
 
 @router.post("/clear_room/{room_id}")
-async def clear_room(room_id: str, redis_client: CustomRedis = Depends(get_redis)):
+async def clear_room(room_id: str, shards: ShardedRedis = Depends(get_redis_shards)):
     # Асинхронно удаляем ключ, связанный с room_id
-    await redis_client.unlink(room_id)
+    await delete_room(shards, room_id)
     return {"status": "ok", "message": f"Ключ для комнаты {room_id} удален"}
 
 
 @router.post("/clear_redis")
-async def clear_redis(redis_client: CustomRedis = Depends(get_redis)):
-    # Очищаем все ключи из Redis
-    await redis_client.flushdb()
-    return {"message": "Redis база данных очищена"}
+async def clear_redis(namespace: Optional[str] = None):
+    # Ключи удаляются в фоне по одному пространству имен за раз, без FLUSHDB,
+    # чтобы не останавливать живые чаты. Без namespace очищаются все
+    namespaces = [namespace] if namespace else list(NAMESPACES)
+    if namespace and namespace not in NAMESPACES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Неизвестное пространство имен, допустимые: {', '.join(NAMESPACES)}",
+        )
+    if not redis_cleanup.start(namespaces):
+        return {"message": "Очистка уже выполняется", **redis_cleanup.status()}
+    return {"message": "Очистка Redis запущена", **redis_cleanup.status()}
+
+
+@router.get("/clear_redis")
+async def clear_redis_status():
+    # Ход очистки: текущее пространство имен и удаленные ключи по каждому
+    return redis_cleanup.status()
+
+
+@router.get("/redis_stats")
+async def redis_stats(shards: ShardedRedis = Depends(get_redis_shards)):
+    # Пулы соединений и задержки команд по каждому узлу Redis
+    return shards.stats()
 
 
 @router.post("/send-msg/{room_id}")
-async def vote(room_id: str, msg: SMessge):
+@timed("send_msg")
+async def vote(
+    room_id: str, msg: SMessge, shards: ShardedRedis = Depends(get_redis_shards)
+):
     data = msg.model_dump()
+    # Активность в чате продлевает жизнь комнаты
+    await touch_room(shards, room_id, msg.user_id)
     is_sent = await send_msg(data=data, channel_name=room_id)
     return {"status": "ok" if is_sent else "failed"}
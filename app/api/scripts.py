@@ -0,0 +1,271 @@
+from typing import Dict
+from redis.commands.core import AsyncScript
+from app.redis_dao.custom_redis import CustomRedis
+
+# Комната хранится в Redis как хэш под ключом ROOM_PREFIX + ключ комнаты.
+# Сам ключ комнаты без префикса служит именем канала Centrifugo, поэтому
+# скрипты принимают и возвращают его, а в KEYS передаются ключи Redis.
+#   room_key, created_at, count  - ключ комнаты, время создания, число участников
+#   p<n>:<поле>                  - поля участника n (1 или 2) из PARTNER_FIELDS
+ROOM_PREFIX = "room:"
+PARTNER_FIELDS = (
+    "id",
+    "nickname",
+    "gender",
+    "age",
+    "find_gender",
+    "age_from",
+    "age_to",
+    "token",
+)
+
+# Переводит комнату, сохраненную строкой JSON, в хэш с сохранением TTL.
+# Комнаты без TTL (до введения ROOM_TTL) получают room_ttl, если он передан.
+_MIGRATE_ROOM_FUNCTION = """
+local PARTNER_FIELDS = {%s}
+
+local function partner_fields(n, partner)
+    local fields = {}
+    for _, field in ipairs(PARTNER_FIELDS) do
+        if partner[field] ~= nil then
+            table.insert(fields, 'p' .. n .. ':' .. field)
+            table.insert(fields, partner[field])
+        end
+    end
+    return fields
+end
+
+local function migrate_room(key, room_ttl)
+    if redis.call('TYPE', key)['ok'] ~= 'string' then
+        return 0
+    end
+    local room = cjson.decode(redis.call('GET', key))
+    local ttl = redis.call('PTTL', key)
+    local fields = {
+        'room_key', room['room_key'],
+        'created_at', room['created_at'],
+        'count', #room['partners'],
+    }
+    for n, partner in ipairs(room['partners']) do
+        for _, value in ipairs(partner_fields(n, partner)) do
+            table.insert(fields, value)
+        end
+    end
+    redis.call('DEL', key)
+    redis.call('HSET', key, unpack(fields))
+    if ttl > 0 then
+        redis.call('PEXPIRE', key, ttl)
+    elseif room_ttl then
+        redis.call('EXPIRE', key, room_ttl)
+    end
+    return 1
+end
+""" % ", ".join(
+    f"'{field}'" for field in PARTNER_FIELDS
+)
+
+# KEYS[1] - ключ комнаты
+# ARGV[1] - время жизни комнаты в секундах для комнат без TTL
+MIGRATE_ROOM = (
+    _MIGRATE_ROOM_FUNCTION
+    + """
+return migrate_room(KEYS[1], ARGV[1])
+"""
+)
+
+# Общие функции подбора: чтение комнаты, выбор самой старой совместимой
+# ожидающей комнаты среди индексов, занятие комнаты и создание новой.
+# Хэш комнаты хранит поле index - ключ индекса ожидания, в котором она лежит.
+_MATCHING_FUNCTIONS = (
+    """
+local ROOM_PREFIX = '%s'
+
+local function room_key_of(key)
+    return string.sub(key, #ROOM_PREFIX + 1)
+end
+
+-- Поля комнаты; строки JSON переводятся в хэш при первом обращении
+local function read_room(key, ...)
+    local values = redis.pcall('HMGET', key, ...)
+    if values['err'] then
+        migrate_room(key)
+        values = redis.call('HMGET', key, ...)
+    end
+    return values
+end
+
+local function gender_ok(find_gender, gender)
+    return find_gender == 'any' or find_gender == gender
+end
+
+-- Возвращает ключ Redis, индекс и время создания самой старой подходящей комнаты
+local function find_oldest(index_keys, user)
+    local user_id = tostring(user['id'])
+    local best_key, best_index, best_created_at
+    for _, index_key in ipairs(index_keys) do
+        local members = redis.call('ZRANGEBYSCORE', index_key, user['age_from'], user['age_to'])
+        for _, key in ipairs(members) do
+            local room = read_room(
+                key, 'count', 'created_at', 'p1:id', 'p1:gender',
+                'p1:find_gender', 'p1:age', 'p1:age_from', 'p1:age_to'
+            )
+            if room[1] ~= '1' then
+                redis.call('ZREM', index_key, key)
+            else
+                local partner_age = tonumber(room[6])
+                if room[3] ~= user_id
+                    and gender_ok(room[5], user['gender'])
+                    and gender_ok(user['find_gender'], room[4])
+                    and tonumber(room[7]) <= user['age'] and user['age'] <= tonumber(room[8])
+                    and user['age_from'] <= partner_age and partner_age <= user['age_to']
+                    and (best_created_at == nil or room[2] < best_created_at) then
+                    best_key, best_index, best_created_at = key, index_key, room[2]
+                end
+            end
+        end
+    end
+    return best_key, best_index, best_created_at
+end
+
+-- Добавляет пользователя вторым участником; возвращает id и никнейм партнера
+local function claim(key, user, room_ttl)
+    local room = read_room(key, 'count', 'p1:id', 'p1:nickname', 'index')
+    if room[1] ~= '1' or room[2] == tostring(user['id']) then
+        return nil
+    end
+    redis.call('HSET', key, 'count', 2, unpack(partner_fields(2, user)))
+    redis.call('EXPIRE', key, room_ttl)
+    if room[4] then
+        redis.call('ZREM', room[4], key)
+    end
+    return {tonumber(room[2]), room[3]}
+end
+
+local function create(key, index_key, user, created_at, room_ttl)
+    redis.call(
+        'HSET', key,
+        'room_key', room_key_of(key), 'created_at', created_at, 'count', 1,
+        'index', index_key, unpack(partner_fields(1, user))
+    )
+    redis.call('EXPIRE', key, room_ttl)
+    redis.call('ZADD', index_key, user['age'], key)
+end
+"""
+    % ROOM_PREFIX
+)
+
+# Атомарный подбор партнера, когда все ключи находятся на одном узле:
+# проверка текущей комнаты пользователя, выбор самой старой совместимой
+# ожидающей комнаты и вход в нее либо создание новой.
+#
+# KEYS[1]     - указатель на комнату пользователя (хранит ключ Redis комнаты)
+# KEYS[2]     - индекс ожидания, в который попадет новая комната
+# KEYS[3..]   - индексы с потенциальными партнерами
+# ARGV[1]     - данные пользователя в JSON
+# ARGV[2]     - ключ новой комнаты
+# ARGV[3]     - время создания новой комнаты
+# ARGV[4]     - время жизни комнаты в секундах
+MATCH_OR_CREATE_ROOM = (
+    _MIGRATE_ROOM_FUNCTION
+    + _MATCHING_FUNCTIONS
+    + """
+local user = cjson.decode(ARGV[1])
+local room_ttl = ARGV[4]
+local user_id = tostring(user['id'])
+
+local current_key = redis.call('GET', KEYS[1])
+if current_key then
+    local room = read_room(current_key, 'count', 'p1:id', 'p2:id')
+    if room[1] and (room[2] == user_id or room[3] == user_id) then
+        redis.call('EXPIRE', current_key, room_ttl)
+        redis.call('EXPIRE', KEYS[1], room_ttl)
+        return {'refund', room_key_of(current_key), tonumber(room[1])}
+    end
+end
+
+local best_key = find_oldest({unpack(KEYS, 3)}, user)
+if best_key then
+    local partner = claim(best_key, user, room_ttl)
+    redis.call('SET', KEYS[1], best_key, 'EX', room_ttl)
+    return {'matched', room_key_of(best_key), 2, partner[1], partner[2]}
+end
+
+local new_key = ROOM_PREFIX .. ARGV[2]
+create(new_key, KEYS[2], user, ARGV[3], room_ttl)
+redis.call('SET', KEYS[1], new_key, 'EX', room_ttl)
+return {'waiting', ARGV[2], 1}
+"""
+)
+
+# Поиск кандидата на одном узле без занятия комнаты.
+#
+# KEYS     - индексы с потенциальными партнерами на этом узле
+# ARGV[1]  - данные пользователя в JSON
+# Возвращает {ключ комнаты, время создания} или пустой список.
+FIND_OLDEST_ROOM = (
+    _MIGRATE_ROOM_FUNCTION
+    + _MATCHING_FUNCTIONS
+    + """
+local best_key, _, best_created_at = find_oldest(KEYS, cjson.decode(ARGV[1]))
+if best_key then
+    return {room_key_of(best_key), best_created_at}
+end
+return {}
+"""
+)
+
+# Занятие найденной комнаты, если она все еще ожидает.
+#
+# KEYS[1]  - ключ Redis комнаты
+# ARGV[1]  - данные пользователя в JSON
+# ARGV[2]  - время жизни комнаты в секундах
+# Возвращает {id партнера, никнейм партнера} или пустой список.
+CLAIM_ROOM = (
+    _MIGRATE_ROOM_FUNCTION
+    + _MATCHING_FUNCTIONS
+    + """
+return claim(KEYS[1], cjson.decode(ARGV[1]), ARGV[2]) or {}
+"""
+)
+
+# Создание ожидающей комнаты.
+#
+# KEYS[1]  - ключ Redis комнаты
+# KEYS[2]  - индекс ожидания
+# ARGV[1]  - данные пользователя в JSON
+# ARGV[2]  - время создания
+# ARGV[3]  - время жизни комнаты в секундах
+CREATE_ROOM = (
+    _MIGRATE_ROOM_FUNCTION
+    + _MATCHING_FUNCTIONS
+    + """
+create(KEYS[1], KEYS[2], cjson.decode(ARGV[1]), ARGV[2], ARGV[3])
+return 1
+"""
+)
+
+# Удаление комнаты вместе с ее записью в индексе ожидания.
+#
+# KEYS[1]  - ключ Redis комнаты
+DELETE_ROOM = """
+local index = redis.pcall('HGET', KEYS[1], 'index')
+if type(index) == 'string' then
+    redis.call('ZREM', index, KEYS[1])
+end
+return redis.call('UNLINK', KEYS[1])
+"""
+
+_registered: Dict[str, AsyncScript] = {}
+
+
+def get_script(redis_client: CustomRedis, source: str) -> AsyncScript:
+    """
+    Возвращает зарегистрированный Lua-скрипт.
+
+    Скрипт регистрируется один раз, далее вызывается через EVALSHA.
+    """
+    script = _registered.get(source)
+    if script is None:
+        script = redis_client.register_script(source)
+        _registered[source] = script
+    return script
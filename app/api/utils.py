@@ -1,35 +1,39 @@
 import json
 import time
-import uuid
-from datetime import datetime
 from typing import List, Dict, Any
 from fastapi import HTTPException
-from loguru import logger
 import jwt
-import httpx
 from app.config import settings
+from app.centrifugo.manager import centrifugo_publisher
 from app.dao.dao import UserDAO
-from app.redis_dao.custom_redis import CustomRedis
+from app.metrics.metrics import track
+from app.redis_dao.local_cache import LocalTTLCache
+from app.redis_dao.manager import cached
+
+PROFILE_CACHE_KEY = "profile:{user_id}"
 
 
 async def send_msg(data: dict, channel_name: str) -> bool:
     # Сериализуем данные в JSON
     json_data = json.dumps(data)
-    payload = {
-        "method": "publish",
-        "params": {"channel": channel_name, "data": json_data},
-    }
-    headers = {"X-API-Key": settings.CENTRIFUGO_API_KEY}
-    async with httpx.AsyncClient(timeout=90) as client:
-        response = await client.post(
-            url=settings.CENTRIFUGO_URL, json=payload, headers=headers
-        )
-        return response.status_code == 200
+    with track("centrifugo"):
+        return await centrifugo_publisher.publish(channel=channel_name, data=json_data)
 
 
-async def generate_client_token(user_id, secret_key):
-    # Устанавливаем время жизни токена (например, 60 минут)
-    exp = int(time.time()) + 60 * 60  # Время истечения в секундах
+def notify_matched(room_key: str, partners: List[Dict[str, Any]]):
+    """
+    Отправляет в канал комнаты событие о том, что партнер найден.
+
+    Ожидающему клиенту больше не нужно опрашивать /api/room-status:
+    каждый участник находит в partners собеседника по своему id.
+    """
+    data = {"type": "matched", "room_key": room_key, "partners": partners}
+    centrifugo_publisher.publish_nowait(channel=room_key, data=json.dumps(data))
+
+
+def generate_client_token(user_id, secret_key, ttl: int = 60 * 60):
+    # Устанавливаем время жизни токена (по умолчанию 60 минут)
+    exp = int(time.time()) + ttl  # Время истечения в секундах
 
     # Создаем полезную нагрузку токена
     payload = {
@@ -41,102 +45,56 @@ async def generate_client_token(user_id, secret_key):
     return jwt.encode(payload, secret_key, algorithm="HS256")
 
 
-async def create_new_room(
-    user_id: int,
-    user_nickname: str,
-    user_gender: str,
-    user_age: int,
-    find_gender: str,
-    age_from: int,
-    age_to: int,
-    redis_client: CustomRedis,
-):
-    new_room_key = f"{find_gender}_{uuid.uuid4().hex[:10]}"
-    user_token = await generate_client_token(user_id, settings.SECRET_KEY)
-
-    new_room_data = {
-        "partners": [
-            {
-                "id": user_id,
-                "nickname": user_nickname,
-                "gender": user_gender,
-                "age": user_age,
-                "find_gender": find_gender,
-                "age_from": age_from,
-                "age_to": age_to,
-                "token": user_token,
-            }
-        ],
-        "created_at": datetime.now().isoformat(),
-        "room_key": new_room_key,
-    }
-
-    await redis_client.set(new_room_key, json.dumps(new_room_data))
-    return {
-        "status": "waiting",
-        "room_key": new_room_key,
-        "message": "Ожидаем подходящего партнера",
-        "token": user_token,
-        "sender": user_nickname,
-        "user_id": user_id,
-    }
-
-
-async def add_user_to_room(
-    room,
-    user_id,
-    user_nickname,
-    user_gender,
-    user_age,
-    find_gender,
-    age_from,
-    age_to,
-    redis_client,
-):
-    partners = room.get("partners", [])
-    new_user_token = await generate_client_token(user_id, settings.SECRET_KEY)
-    # Добавляем текущего пользователя в комнату
-    new_partner = {
-        "id": user_id,
-        "nickname": user_nickname,
-        "gender": user_gender,
-        "age": user_age,
-        "find_gender": find_gender,
-        "age_from": age_from,
-        "age_to": age_to,
-        "token": new_user_token,
-    }
-    partners.append(new_partner)
+# Запись живет меньше самого токена, чтобы выданный из кэша токен
+# оставался действительным еще как минимум CLIENT_TOKEN_REFRESH_MARGIN секунд
+_client_tokens = LocalTTLCache(
+    maxsize=settings.CLIENT_TOKEN_CACHE_SIZE,
+    ttl=settings.CLIENT_TOKEN_TTL - settings.CLIENT_TOKEN_REFRESH_MARGIN,
+)
 
-    # Обновляем данные комнаты в Redis
-    room_key = room.get("room_key")
-    await redis_client.set(room_key, json.dumps(room))
-
-    # Возвращаем статус "matched"
-    return {
-        "status": "matched",
-        "room_key": room_key,
-        "message": "Партнер найден",
-        "token": new_user_token,
-        "sender": user_nickname,
-        "user_id": user_id,
-    }
 
+def get_client_token(user_id: int) -> str:
+    """
+    Возвращает токен Centrifugo пользователя.
 
-async def refund_partner(
-    room_key, user_id, user_nickname, status="matched", message="Партнер найден"
-):
-    new_user_token = await generate_client_token(user_id, settings.SECRET_KEY)
+    Токен подписывается один раз и переиспользуется, пока до его истечения
+    остается больше CLIENT_TOKEN_REFRESH_MARGIN секунд.
+    """
+    found, token = _client_tokens.get(user_id)
+    if not found:
+        with track("jwt"):
+            token = generate_client_token(
+                user_id, settings.SECRET_KEY, ttl=settings.CLIENT_TOKEN_TTL
+            )
+        _client_tokens.set(user_id, token)
+    return token
+
+
+def room_response(
+    room_key: str,
+    user_id: int,
+    user_nickname: str,
+    user_token: str,
+    status: str = "matched",
+    message: str = "Партнер найден",
+) -> Dict[str, Any]:
+    """Формирует ответ клиенту о состоянии его комнаты."""
     return {
         "status": status,
         "room_key": room_key,
         "message": message,
-        "token": new_user_token,
+        "token": user_token,
         "sender": user_nickname,
         "user_id": user_id,
     }
 
 
+@cached(
+    cache_key=PROFILE_CACHE_KEY,
+    ttl=settings.PROFILE_CACHE_TTL,
+    local_maxsize=settings.PROFILE_LOCAL_CACHE_SIZE,
+    local_ttl=settings.PROFILE_LOCAL_CACHE_TTL,
+)
 async def get_user_info(session, user_id):
     full_user_data = await UserDAO(session).find_one_or_none_by_id(user_id)
     if not full_user_data:
@@ -148,31 +106,6 @@ async def get_user_info(session, user_id):
     }
 
 
-async def get_all_rooms_gender(redis_client: CustomRedis) -> List[Dict[str, Any]]:
-    """
-    Возвращает все данные по ключам.
-
-    :param redis_client: Клиент Redis.
-    :return: Список словарей с данными комнат.
-    """
-    all_keys = await redis_client.keys()
-    rooms_data = []
-
-    if all_keys:
-        # Используем mget для получения значений по всем ключам одновременно
-        values = await redis_client.mget(all_keys)
-
-        for key, value in zip(all_keys, values):
-            if value:
-                try:
-                    room_dict = json.loads(value)
-                    rooms_data.append(room_dict)
-                except json.JSONDecodeError:
-                    logger.error(f"Ошибка декодирования JSON для ключа {key}")
-
-    return rooms_data
-
-
 def is_match(
     user_gender: str,
     user_find_gender: str,
@@ -188,6 +121,8 @@ def is_match(
     """
     Проверяет, подходят ли пользователь и партнер друг другу по полу и возрасту.
 
+    Те же условия проверяются в Lua-скриптах подбора (app.api.scripts).
+
     :param user_gender: Пол текущего пользователя.
     :param user_find_gender: Пол, который ищет текущий пользователь.
     :param user_age: Возраст текущего пользователя.
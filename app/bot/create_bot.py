@@ -2,18 +2,29 @@
 from aiogram import Bot, Dispatcher
 from aiogram.client.default import DefaultBotProperties
 from aiogram.enums import ParseMode
-from aiogram.fsm.storage.memory import MemoryStorage
 from aiogram.types import BotCommand, BotCommandScopeDefault
 from aiogram_dialog import setup_dialogs
 from loguru import logger
 from app.bot.dialog.dialog import form_dialog
+from app.bot.sender import MessageSender
+from app.bot.storage import fsm_isolation, fsm_storage
 from app.bot.user.router import router as user_router
 from app.config import settings
-from app.dao.database_middleware import DatabaseMiddlewareWithoutCommit, DatabaseMiddlewareWithCommit
-from app.dao.create_db import create_users_table
+from app.dao.database_middleware import setup_database_middleware
+from app.dao.create_db import create_schema
 
 bot = Bot(token=settings.BOT_TOKEN, default=DefaultBotProperties(parse_mode=ParseMode.HTML))
-dp = Dispatcher(storage=MemoryStorage())
+# Состояния FSM и стеки диалогов хранятся в Redis и общие для всех процессов
+dp = Dispatcher(storage=fsm_storage)
+# Все исходящие рассылки идут через очередь с ограничением частоты Telegram
+message_sender = MessageSender(
+    bot,
+    rate=settings.TELEGRAM_SEND_RATE,
+    chat_interval=settings.TELEGRAM_CHAT_INTERVAL,
+    concurrency=settings.TELEGRAM_SEND_CONCURRENCY,
+    retries=settings.TELEGRAM_SEND_RETRIES,
+    queue_size=settings.TELEGRAM_SEND_QUEUE_SIZE,
+)
 
 
 async def set_commands():
@@ -23,27 +34,18 @@ async def set_commands():
 
 # Функция, которая выполнится когда бот запустится
 async def start_bot():
-    await create_users_table()
-    setup_dialogs(dp)
-    dp.update.middleware.register(DatabaseMiddlewareWithoutCommit())
-    dp.update.middleware.register(DatabaseMiddlewareWithCommit())
+    await create_schema()
+    setup_dialogs(dp, events_isolation=fsm_isolation)
+    setup_database_middleware(dp)
     await set_commands()
     dp.include_router(form_dialog)
     dp.include_router(user_router)
 
-    for admin_id in settings.ADMIN_IDS:
-        try:
-            await bot.send_message(admin_id, f'Я запущен🥳.')
-        except:
-            pass
+    await message_sender.broadcast(settings.ADMIN_IDS, 'Я запущен🥳.')
     logger.info("Бот успешно запущен.")
 
 
 # Функция, которая выполнится когда бот завершит свою работу
 async def stop_bot():
-    try:
-        for admin_id in settings.ADMIN_IDS:
-            await bot.send_message(admin_id, 'Бот остановлен. За что?😔')
-    except:
-        pass
+    await message_sender.broadcast(settings.ADMIN_IDS, 'Бот остановлен. За что?😔')
     logger.error("Бот остановлен!")
@@ -3,9 +3,11 @@ from aiogram.types import CallbackQuery, Message
 from aiogram_dialog import DialogManager
 from aiogram_dialog.widgets.kbd import Button
 
+from app.api.utils import get_user_info
 from app.bot.kbs import main_user_kb
 from app.bot.schemas import UserSchema
 from app.dao.dao import UserDAO
+from app.dao.writer import db_writer
 
 
 async def cancel_logic(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
@@ -27,7 +29,6 @@ async def process_gender(callback: CallbackQuery, button: Button, dialog_manager
 
 async def on_confirmation(callback: CallbackQuery, button: Button, dialog_manager: DialogManager):
     await callback.answer("Приступаю к сохранению")
-    session = dialog_manager.middleware_data.get("session_with_commit")
     user_id = callback.from_user.id
     user = UserSchema(id=user_id,
                       username=callback.from_user.username,
@@ -36,7 +37,8 @@ async def on_confirmation(callback: CallbackQuery, button: Button, dialog_manage
                       nickname=dialog_manager.dialog_data["nickname"],
                       gender=dialog_manager.dialog_data["gender"],
                       age=dialog_manager.dialog_data["age"])
-    await UserDAO(session).add(user)
+    await db_writer.run(lambda session: UserDAO(session).add(user))
+    await get_user_info.invalidate(user_id=user_id)
     text = "Спасибо, что ответили на все вопросы! Теперь вам доступен доступ к чату."
     await callback.message.answer(text, reply_markup=main_user_kb(user_id, dialog_manager.dialog_data["nickname"]))
     await dialog_manager.done()
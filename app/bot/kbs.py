@@ -1,28 +1,70 @@
+from typing import List
 from aiogram.types import InlineKeyboardMarkup, InlineKeyboardButton, WebAppInfo
-from aiogram.utils.keyboard import InlineKeyboardBuilder
 from app.config import settings
+from app.redis_dao.local_cache import LocalTTLCache
 
+# Кнопки без данных пользователя создаются один раз при запуске
+PROFILE_BUTTON = InlineKeyboardButton(text="👤 Мой профиль", callback_data="my_profile")
+EDIT_NICKNAME_BUTTON = InlineKeyboardButton(
+    text="Изменить никнейм", callback_data="edit_nickname"
+)
+EDIT_AGE_BUTTON = InlineKeyboardButton(text="Изменить возраст", callback_data="edit_age")
+ABOUT_BUTTON = InlineKeyboardButton(text="ℹ️ О нас", callback_data="about_us")
+
+# Готовые клавиатуры пользователей: ключ - (вид клавиатуры, user_id),
+# значение - (никнейм, клавиатура). Смена никнейма пересобирает клавиатуру
+_keyboards = LocalTTLCache(
+    maxsize=settings.KEYBOARD_CACHE_SIZE, ttl=settings.KEYBOARD_CACHE_TTL
+)
 
-def main_user_kb(user_id: int, sender: str) -> InlineKeyboardMarkup:
-    kb = InlineKeyboardBuilder()
 
-    kb.button(text="👤 Мой профиль", callback_data="my_profile")
-    kb.button(text="ℹ️ О нас", callback_data=f"about_us_{sender}")
+def _chat_button(user_id: int, sender: str) -> InlineKeyboardButton:
     url = f"{settings.FRONT_URL}?user_id={user_id}&sender={sender}"
-    kb.button(text="💬 Чат Тет-а-тет", web_app=WebAppInfo(url=url))
+    return InlineKeyboardButton(text="💬 Чат Тет-а-тет", web_app=WebAppInfo(url=url))
 
-    kb.adjust(1)
-    return kb.as_markup()
 
+def _column(*buttons: InlineKeyboardButton) -> InlineKeyboardMarkup:
+    rows: List[List[InlineKeyboardButton]] = [[button] for button in buttons]
+    return InlineKeyboardMarkup(inline_keyboard=rows)
 
-def profile_kb(user_id: int, sender: str):
-    kb = InlineKeyboardBuilder()
 
-    kb.button(text="Изменить никнейм", callback_data="edit_nickname")
-    kb.button(text="Изменить возраст", callback_data="edit_age")
-    kb.button(text="ℹ️ О нас", callback_data="about_us")
-    url = f"{settings.FRONT_URL}?user_id={user_id}&sender={sender}"
-    kb.button(text="💬 Чат Тет-а-тет", web_app=WebAppInfo(url=url))
+def _cached(kind: str, user_id: int, sender: str, build) -> InlineKeyboardMarkup:
+    found, item = _keyboards.get((kind, user_id))
+    if found and item[0] == sender:
+        return item[1]
+    markup = build()
+    _keyboards.set((kind, user_id), (sender, markup))
+    return markup
+
+
+def main_user_kb(user_id: int, sender: str) -> InlineKeyboardMarkup:
+    return _cached(
+        "main",
+        user_id,
+        sender,
+        lambda: _column(
+            PROFILE_BUTTON,
+            InlineKeyboardButton(text="ℹ️ О нас", callback_data=f"about_us_{sender}"),
+            _chat_button(user_id, sender),
+        ),
+    )
+
+
+def profile_kb(user_id: int, sender: str) -> InlineKeyboardMarkup:
+    return _cached(
+        "profile",
+        user_id,
+        sender,
+        lambda: _column(
+            EDIT_NICKNAME_BUTTON,
+            EDIT_AGE_BUTTON,
+            ABOUT_BUTTON,
+            _chat_button(user_id, sender),
+        ),
+    )
+
 
-    kb.adjust(1)
-    return kb.as_markup()
\ No newline at end of file
+def invalidate_user_kbs(user_id: int):
+    """Удаляет клавиатуры пользователя из кэша, например после смены никнейма."""
+    _keyboards.delete(("main", user_id))
+    _keyboards.delete(("profile", user_id))
@@ -0,0 +1,219 @@
+import asyncio
+from loguru import logger
+from time import monotonic
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+from aiogram import Bot
+from aiogram.exceptions import (
+    TelegramNetworkError,
+    TelegramRetryAfter,
+    TelegramServerError,
+)
+from prometheus_client import Counter, Gauge
+from app.dao.dao import UserDAO
+from app.dao.database import async_session_maker
+
+TELEGRAM_MESSAGES = Counter(
+    "tetatet_telegram_messages_total",
+    "Исходящие сообщения Telegram по результату отправки",
+    ["result"],
+)
+TELEGRAM_QUEUE_DEPTH = Gauge(
+    "tetatet_telegram_send_queue_depth", "Сообщения Telegram, ожидающие отправки"
+)
+
+# chat_id, текст, параметры send_message, future с результатом отправки
+QueueItem = Tuple[int, str, Dict[str, Any], asyncio.Future]
+
+# Сколько отметок о последней отправке в чаты хранить до очистки устаревших
+CHAT_SENT_LIMIT = 10000
+
+
+class RateLimiter:
+    """
+    Равномерно распределяет вызовы во времени: не чаще rate в секунду.
+
+    Время вызова резервируется до ожидания, поэтому конкурентные корутины
+    не занимают один и тот же интервал.
+    """
+
+    def __init__(self, rate: float):
+        self.interval = 1 / rate
+        self._next = 0.0
+
+    async def acquire(self):
+        now = monotonic()
+        slot = max(now, self._next)
+        self._next = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+    def pause(self, seconds: float):
+        """Откладывает следующие вызовы не менее чем на seconds секунд."""
+        self._next = max(self._next, monotonic() + seconds)
+
+
+class MessageSender:
+    """
+    Очередь исходящих сообщений Telegram с ограничением частоты.
+
+    Сообщения отправляют concurrency воркеров, но не чаще rate в секунду
+    всего и не чаще одного раза в chat_interval секунд в один чат.
+    На TelegramRetryAfter все отправки приостанавливаются на указанное
+    Telegram время, сетевые и серверные ошибки повторяются до retries раз,
+    остальные ошибки (бот заблокирован, чат не найден) считаются неудачей.
+    """
+
+    def __init__(
+        self,
+        bot: Bot,
+        rate: float = 25,
+        chat_interval: float = 1.0,
+        concurrency: int = 10,
+        retries: int = 3,
+        queue_size: int = 10000,
+    ):
+        self.bot = bot
+        self.chat_interval = chat_interval
+        self.concurrency = concurrency
+        self.retries = retries
+        self.stats: Dict[str, int] = {"sent": 0, "failed": 0, "retried": 0}
+        self._limiter = RateLimiter(rate)
+        self._chat_sent: Dict[int, float] = {}
+        self._queue: asyncio.Queue[QueueItem] = asyncio.Queue(maxsize=queue_size)
+        self._workers: List[asyncio.Task] = []
+        TELEGRAM_QUEUE_DEPTH.set_function(self._queue.qsize)
+
+    async def start(self):
+        """Запускает воркеры отправки."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._run()) for _ in range(self.concurrency)
+            ]
+            logger.info(
+                f"Очередь отправки сообщений запущена: {self.concurrency} воркеров"
+            )
+
+    async def stop(self, timeout: Optional[float] = 10):
+        """Отправляет оставшиеся сообщения (не дольше timeout секунд) и останавливает воркеры."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(self._queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Очередь отправки остановлена с {self._queue.qsize()} неотправленными сообщениями"
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info(f"Очередь отправки сообщений остановлена: {self.stats}")
+
+    async def send(self, chat_id: int, text: str, **kwargs) -> asyncio.Future:
+        """
+        Ставит сообщение в очередь; ждет, только если очередь заполнена.
+
+        :return: future, которое получит True после доставки или False при неудаче.
+            Если очередь не запущена, сообщение отправляется сразу.
+        """
+        future = asyncio.get_running_loop().create_future()
+        item = (chat_id, text, kwargs, future)
+        if self._workers:
+            await self._queue.put(item)
+        else:
+            await self._deliver(item)
+        return future
+
+    async def broadcast(
+        self, chat_ids: Iterable[int], text: str, **kwargs
+    ) -> Dict[str, int]:
+        """Отправляет сообщение в каждый чат и возвращает количество доставленных и неудачных."""
+        futures = [await self.send(chat_id, text, **kwargs) for chat_id in chat_ids]
+        results = await asyncio.gather(*futures)
+        sent = sum(results)
+        return {"total": len(results), "sent": sent, "failed": len(results) - sent}
+
+    async def broadcast_to_users(
+        self, text: str, batch_size: int = 1000, **kwargs
+    ) -> Dict[str, int]:
+        """
+        Рассылает сообщение всем пользователям из таблицы users.
+
+        id читаются страницами по batch_size, следующая страница читается,
+        когда отправлена предыдущая, поэтому память не растет с числом пользователей.
+        """
+        totals = {"total": 0, "sent": 0, "failed": 0}
+        last_id = None
+        while True:
+            async with async_session_maker() as session:
+                user_ids = await UserDAO(session).find_ids_after(last_id, batch_size)
+            if not user_ids:
+                break
+            last_id = user_ids[-1]
+            result = await self.broadcast(user_ids, text, **kwargs)
+            for key, value in result.items():
+                totals[key] += value
+            logger.info(f"Рассылка: отправлено {totals['sent']} из {totals['total']}")
+        return totals
+
+    async def _run(self):
+        while True:
+            item = await self._queue.get()
+            try:
+                await self._deliver(item)
+            finally:
+                self._queue.task_done()
+
+    async def _acquire(self, chat_id: int):
+        """Ждет общего лимита и интервала чата, затем отмечает отправку в чат."""
+        while True:
+            await self._limiter.acquire()
+            now = monotonic()
+            wait = self._chat_sent.get(chat_id, 0.0) + self.chat_interval - now
+            if wait <= 0:
+                break
+            await asyncio.sleep(wait)
+        # Между проверкой и отметкой нет await, поэтому два воркера
+        # не отправят в один чат в одном интервале
+        if len(self._chat_sent) > CHAT_SENT_LIMIT:
+            self._chat_sent = {
+                chat: sent
+                for chat, sent in self._chat_sent.items()
+                if sent + self.chat_interval > now
+            }
+        self._chat_sent[chat_id] = now
+
+    async def _deliver(self, item: QueueItem):
+        chat_id, text, kwargs, future = item
+        attempt = 0
+        while True:
+            await self._acquire(chat_id)
+            try:
+                await self.bot.send_message(chat_id, text, **kwargs)
+                result = "sent"
+                break
+            except TelegramRetryAfter as e:
+                # Превышен лимит Telegram: ждут все отправки, не только эта
+                self._limiter.pause(e.retry_after)
+                error = e
+            except (TelegramNetworkError, TelegramServerError) as e:
+                error = e
+                await asyncio.sleep(2**attempt)
+            except Exception as e:
+                logger.warning(f"Сообщение в чат {chat_id} не отправлено: {e}")
+                result = "failed"
+                break
+            attempt += 1
+            if attempt > self.retries:
+                logger.warning(
+                    f"Сообщение в чат {chat_id} не отправлено после {self.retries} повторов: {error}"
+                )
+                result = "failed"
+                break
+            self.stats["retried"] += 1
+            TELEGRAM_MESSAGES.labels("retried").inc()
+
+        self.stats[result] += 1
+        TELEGRAM_MESSAGES.labels(result).inc()
+        if not future.done():
+            future.set_result(result == "sent")
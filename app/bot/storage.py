@@ -0,0 +1,125 @@
+import json
+from contextlib import asynccontextmanager
+from typing import Any, AsyncGenerator, Dict, Optional
+from aiogram.fsm.state import State
+from aiogram.fsm.storage.base import (
+    DEFAULT_DESTINY,
+    BaseEventIsolation,
+    BaseStorage,
+    StateType,
+    StorageKey,
+)
+from redis.asyncio.lock import Lock
+from app.config import settings
+from app.redis_dao.custom_redis import CustomRedis
+from app.redis_dao.manager import redis_manager
+from app.redis_dao.redis_client import RedisClient
+
+# Состояние FSM и данные одного контекста хранятся в одном хэше
+# FSM_PREFIX + <chat_id>[:<user_id>][:<thread_id>][:<business_connection_id>][:<destiny>]
+# с полями FIELD_STATE и FIELD_DATA. user_id опускается, если совпадает с chat_id
+# (личный чат), destiny - если он по умолчанию.
+FSM_PREFIX = "fsm:"
+FIELD_STATE = "s"
+FIELD_DATA = "d"
+LOCK_SUFFIX = ":lock"
+
+
+def fsm_key(key: StorageKey) -> str:
+    """Короткий ключ Redis для контекста FSM."""
+    parts = [str(key.chat_id)]
+    if key.user_id != key.chat_id:
+        parts.append(str(key.user_id))
+    if key.thread_id:
+        parts.append(str(key.thread_id))
+    if key.business_connection_id:
+        parts.append(key.business_connection_id)
+    if key.destiny != DEFAULT_DESTINY:
+        parts.append(key.destiny)
+    return FSM_PREFIX + ":".join(parts)
+
+
+def _decode(value: Any) -> Optional[str]:
+    return value.decode("utf-8") if isinstance(value, bytes) else value
+
+
+class RedisFSMStorage(BaseStorage):
+    """
+    Хранилище FSM и стеков aiogram_dialog в Redis.
+
+    Использует пул соединений redis_manager, поэтому подключение берется
+    при первом обращении, а закрывается вместе с остальным Redis в lifespan.
+    Каждая запись продлевает время жизни контекста до ttl секунд.
+
+    На каждое обновление FSMContextMiddleware читает только состояние (один
+    HGET); данные FSM хендлеры бота не читают, а стеки и контексты
+    aiogram_dialog лежат под своими ключами.
+    """
+
+    def __init__(self, redis_client: RedisClient, ttl: int):
+        self.redis_client = redis_client
+        self.ttl = ttl
+
+    @property
+    def redis(self) -> CustomRedis:
+        return self.redis_client.get_client()
+
+    async def _set_field(self, key: StorageKey, field: str, value: Optional[str]):
+        redis_key = fsm_key(key)
+        if value is None:
+            # Хэш без полей Redis удаляет сам
+            await self.redis.hdel(redis_key, field)
+            return
+        await self.redis.run_pipeline(
+            [
+                ("HSET", redis_key, field, value),
+                ("EXPIRE", redis_key, self.ttl),
+            ]
+        )
+
+    async def set_state(self, key: StorageKey, state: StateType = None) -> None:
+        await self._set_field(
+            key, FIELD_STATE, state.state if isinstance(state, State) else state
+        )
+
+    async def get_state(self, key: StorageKey) -> Optional[str]:
+        return _decode(await self.redis.hget(fsm_key(key), FIELD_STATE))
+
+    async def set_data(self, key: StorageKey, data: Dict[str, Any]) -> None:
+        await self._set_field(key, FIELD_DATA, json.dumps(data) if data else None)
+
+    async def get_data(self, key: StorageKey) -> Dict[str, Any]:
+        value = await self.redis.hget(fsm_key(key), FIELD_DATA)
+        return json.loads(value) if value else {}
+
+    async def close(self) -> None:
+        # Пул принадлежит redis_manager и закрывается в lifespan
+        pass
+
+
+class RedisFSMIsolation(BaseEventIsolation):
+    """
+    Блокировка контекста FSM через Redis.
+
+    Нужна aiogram_dialog, чтобы обновления одного чата не меняли стек диалогов
+    одновременно, даже если их обрабатывают разные процессы.
+    """
+
+    def __init__(self, redis_client: RedisClient, lock_timeout: float = 60):
+        self.redis_client = redis_client
+        self.lock_timeout = lock_timeout
+
+    @asynccontextmanager
+    async def lock(self, key: StorageKey) -> AsyncGenerator[None, None]:
+        redis = self.redis_client.get_client()
+        async with redis.lock(
+            name=fsm_key(key) + LOCK_SUFFIX, timeout=self.lock_timeout, lock_class=Lock
+        ):
+            yield None
+
+    async def close(self) -> None:
+        pass
+
+
+fsm_storage = RedisFSMStorage(redis_manager, ttl=settings.FSM_TTL)
+fsm_isolation = RedisFSMIsolation(redis_manager)
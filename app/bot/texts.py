@@ -0,0 +1,71 @@
+from app.config import settings
+from app.redis_dao.local_cache import LocalTTLCache
+
+ABOUT_TEXT = """
+<b>Добро пожаловать в чат Тет-а-тет!</b>
+
+Мы создали уникальное пространство для анонимного общения, где вы можете познакомиться и пообщаться с интересными людьми в формате один на один.
+
+<b>Что мы предлагаем:</b>
+
+• <i>Анонимность:</i> Ваша приватность - наш приоритет. Общайтесь свободно и безопасно.
+
+• <i>Удобное меню:</i> Простой интерфейс с основными функциями всегда под рукой.
+
+• <i>Гибкий профиль:</i> В разделе "Мой профиль" вы можете в любой момент изменить свои данные.
+
+• <i>Мини-приложение:</i> Наше специальное мини-приложение для комфортного общения.
+
+<b>Наша миссия</b> - создать комфортную среду для новых знакомств и увлекательных бесед. Мы верим, что каждый разговор может стать началом чего-то особенного.
+
+Присоединяйтесь к Тет-а-тет и откройте для себя мир интересных собеседников!
+
+<i>Приятного общения!</i>
+"""
+
+_PROFILE_TEMPLATE = """
+<b>👤 Ваш профиль в Тет-а-тет:</b>
+
+• <b>🏷 Никнейм:</b> {nickname}
+• <b>🎂 Возраст:</b> {age} лет / года
+• <b>⚧ Пол:</b> {gender}
+• <b>📛 Имя:</b> {first_name}
+• <b>👥 Фамилия:</b> {last_name}
+• <b>🆔 Имя пользователя:</b> {username}
+
+✏️ Чтобы изменить данные, воспользуйтесь клавиатурой ниже.
+"""
+
+
+# Готовые тексты профилей: ключ - user_id, значение - (поля профиля, текст).
+# Изменение любого поля пересобирает текст, поэтому запись не нужно
+# сбрасывать ни в этом, ни в других процессах бота
+_profile_texts = LocalTTLCache(
+    maxsize=settings.KEYBOARD_CACHE_SIZE, ttl=settings.KEYBOARD_CACHE_TTL
+)
+
+
+def profile_text(
+    user_id: int,
+    nickname: str,
+    age: int,
+    gender: str,
+    first_name: str | None,
+    last_name: str | None,
+    username: str | None,
+) -> str:
+    """Текст профиля пользователя."""
+    fields = (nickname, age, gender, first_name, last_name, username)
+    found, item = _profile_texts.get(user_id)
+    if found and item[0] == fields:
+        return item[1]
+    text = _PROFILE_TEMPLATE.format(
+        nickname=nickname,
+        age=age,
+        gender="👨 Мужской" if gender == "man" else "👩 Женский",
+        first_name=first_name or "Не указано",
+        last_name=last_name or "Не указана",
+        username=username or "Не указано",
+    )
+    _profile_texts.set(user_id, (fields, text))
+    return text
@@ -0,0 +1,153 @@
+import asyncio
+from loguru import logger
+from time import perf_counter
+from typing import List, Optional, Tuple
+from aiogram import Bot, Dispatcher
+from aiogram.types import Update
+from prometheus_client import Counter, Gauge, Histogram
+from app.bot.create_bot import bot, dp
+from app.config import settings
+from app.metrics.metrics import REQUEST_BUCKETS, request_timer
+
+WEBHOOK_QUEUE_DEPTH = Gauge(
+    "tetatet_webhook_queue_depth", "Обновления Telegram, ожидающие обработки"
+)
+WEBHOOK_QUEUE_WAIT = Histogram(
+    "tetatet_webhook_queue_wait_seconds",
+    "Время ожидания обновления в очереди до начала обработки",
+    buckets=REQUEST_BUCKETS,
+)
+WEBHOOK_REJECTED = Counter(
+    "tetatet_webhook_rejected_total",
+    "Обновления, отклоненные из-за переполнения очереди",
+)
+
+QueueItem = Tuple[Update, float]
+
+
+def chat_key(update: Update) -> int:
+    """
+    Ключ упорядочивания обновления: id чата, а если его нет - id пользователя.
+
+    Обновления с одним ключом обрабатываются строго по очереди.
+    """
+    event = update.event
+    chat = getattr(event, "chat", None)
+    if chat is None:
+        message = getattr(event, "message", None)
+        chat = getattr(message, "chat", None)
+    if chat is not None:
+        return chat.id
+    user = getattr(event, "from_user", None)
+    return user.id if user is not None else update.update_id
+
+
+class UpdateWorkerPool:
+    """
+    Пул воркеров, обрабатывающих обновления Telegram вне запроса вебхука.
+
+    Каждый чат закреплен за одним воркером по своему id, поэтому обновления
+    одного чата обрабатываются по порядку, а разные чаты - параллельно.
+    Очереди воркеров ограничены: если очередь переполнена дольше
+    enqueue_timeout, обновление отклоняется и Telegram доставит его повторно.
+    """
+
+    def __init__(
+        self,
+        dispatcher: Dispatcher,
+        bot: Bot,
+        workers: int = 16,
+        queue_size: int = 100,
+        enqueue_timeout: float = 1.0,
+    ):
+        self.dispatcher = dispatcher
+        self.bot = bot
+        self.enqueue_timeout = enqueue_timeout
+        self._queues: List[asyncio.Queue[QueueItem]] = [
+            asyncio.Queue(maxsize=queue_size) for _ in range(workers)
+        ]
+        self._workers: List[asyncio.Task] = []
+        WEBHOOK_QUEUE_DEPTH.set_function(self.qsize)
+
+    def qsize(self) -> int:
+        """Количество обновлений, ожидающих обработки."""
+        return sum(queue.qsize() for queue in self._queues)
+
+    async def start(self):
+        """Запускает воркеры."""
+        if not self._workers:
+            self._workers = [
+                asyncio.create_task(self._run(queue)) for queue in self._queues
+            ]
+            logger.info(
+                f"Пул обработки обновлений запущен: {len(self._workers)} воркеров"
+            )
+
+    async def stop(self, timeout: Optional[float] = 10):
+        """Дообрабатывает очереди (не дольше timeout секунд) и останавливает воркеры."""
+        if not self._workers:
+            return
+        try:
+            await asyncio.wait_for(
+                asyncio.gather(*(queue.join() for queue in self._queues)), timeout
+            )
+        except asyncio.TimeoutError:
+            logger.error(
+                f"Пул остановлен с {self.qsize()} необработанными обновлениями"
+            )
+        for worker in self._workers:
+            worker.cancel()
+        await asyncio.gather(*self._workers, return_exceptions=True)
+        self._workers = []
+        logger.info("Пул обработки обновлений остановлен")
+
+    async def submit(self, update: Update) -> bool:
+        """
+        Ставит обновление в очередь его чата.
+
+        Если пул не запущен, обновление обрабатывается сразу.
+        :return: False, если очередь так и не освободилась за enqueue_timeout.
+        """
+        if not self._workers:
+            await self._process(update)
+            return True
+        queue = self._queues[chat_key(update) % len(self._queues)]
+        item = (update, perf_counter())
+        try:
+            queue.put_nowait(item)
+        except asyncio.QueueFull:
+            try:
+                await asyncio.wait_for(queue.put(item), self.enqueue_timeout)
+            except asyncio.TimeoutError:
+                WEBHOOK_REJECTED.inc()
+                logger.warning(
+                    f"Очередь обновлений переполнена, обновление {update.update_id} отклонено"
+                )
+                return False
+        return True
+
+    async def _run(self, queue: asyncio.Queue):
+        while True:
+            update, enqueued_at = await queue.get()
+            WEBHOOK_QUEUE_WAIT.observe(perf_counter() - enqueued_at)
+            try:
+                await self._process(update)
+            finally:
+                queue.task_done()
+
+    async def _process(self, update: Update):
+        with request_timer("webhook"):
+            try:
+                await self.dispatcher.feed_update(self.bot, update)
+                logger.info("Обновление успешно обработано.")
+            except Exception as e:
+                logger.error(f"Ошибка при обработке обновления с вебхука: {e}")
+
+
+update_pool = UpdateWorkerPool(
+    dp,
+    bot,
+    workers=settings.WEBHOOK_WORKERS,
+    queue_size=settings.WEBHOOK_QUEUE_SIZE,
+    enqueue_timeout=settings.WEBHOOK_ENQUEUE_TIMEOUT,
+)
@@ -0,0 +1,160 @@
+import asyncio
+import httpx
+from loguru import logger
+from typing import List, Optional, Tuple
+from app.metrics.metrics import CENTRIFUGO_FAILURES
+
+
+class CentrifugoClient:
+    """
+    Класс для управления долгоживущим HTTP-клиентом Centrifugo с пулом соединений.
+
+    Одиночные публикации идут в прежнем формате {"method": ..., "params": ...},
+    который понимают все версии Centrifugo. Batch API (/api/batch) есть только
+    начиная с v5: его наличие проверяется при подключении, и если сервер его не
+    поддерживает, пачки отправляются отдельными публикациями.
+    """
+
+    def __init__(
+        self,
+        url: str,
+        api_key: str,
+        batch_url: str,
+        timeout: float = 5.0,
+        connect_timeout: float = 2.0,
+        max_connections: int = 100,
+        max_keepalive_connections: int = 20,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ):
+        self.url = url
+        self.batch_url = batch_url
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.limits = httpx.Limits(
+            max_connections=max_connections,
+            max_keepalive_connections=max_keepalive_connections,
+        )
+        self.transport = transport
+        # None - поддержка batch API еще не известна
+        self.batch_supported: Optional[bool] = None
+        self._client: Optional[httpx.AsyncClient] = None
+
+    async def connect(self):
+        """Создает HTTP-клиент с keep-alive и ограниченным пулом соединений."""
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                timeout=self.timeout,
+                limits=self.limits,
+                headers={"X-API-Key": self.api_key},
+                transport=self.transport,
+            )
+            logger.info("HTTP-клиент Centrifugo создан")
+            await self._check_batch_api()
+
+    async def _check_batch_api(self):
+        # Пустая пачка ничего не публикует: v5 отвечает 200, старые версии - 404
+        try:
+            response = await self._client.post(self.batch_url, json={"commands": []})
+        except httpx.HTTPError as e:
+            logger.warning(f"Не удалось проверить batch API Centrifugo: {e}")
+            return
+        self._set_batch_supported(response.status_code == 200)
+
+    def _set_batch_supported(self, supported: bool):
+        self.batch_supported = supported
+        if not supported:
+            logger.warning(
+                "Centrifugo не поддерживает batch API, "
+                "сообщения публикуются по одному"
+            )
+
+    async def close(self):
+        """Закрывает HTTP-клиент и все соединения пула."""
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+            logger.info("HTTP-клиент Centrifugo закрыт")
+
+    def get_client(self) -> httpx.AsyncClient:
+        """Возвращает объект HTTP-клиента."""
+        if self._client is None:
+            raise RuntimeError(
+                "HTTP-клиент Centrifugo не инициализирован. Проверьте lifespan."
+            )
+        return self._client
+
+    async def publish(self, channel: str, data: str) -> bool:
+        """
+        Публикует сообщение в канал Centrifugo.
+
+        :param channel: Имя канала.
+        :param data: Сериализованные в JSON данные сообщения.
+        :return: True, если Centrifugo принял сообщение, иначе False.
+        """
+        payload = {
+            "method": "publish",
+            "params": {"channel": channel, "data": data},
+        }
+        try:
+            response = await self.get_client().post(self.url, json=payload)
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка публикации в канал {channel}: {e}")
+            CENTRIFUGO_FAILURES.inc()
+            return False
+        if response.status_code != 200:
+            CENTRIFUGO_FAILURES.inc()
+            return False
+        return True
+
+    async def publish_batch(self, messages: List[Tuple[str, str]]) -> List[bool]:
+        """
+        Публикует несколько сообщений одним batch-запросом Centrifugo.
+
+        Если сервер не поддерживает batch API, сообщения публикуются по одному
+        параллельно.
+
+        :param messages: Список пар (канал, сериализованные данные).
+        :return: Статус доставки для каждого сообщения в исходном порядке.
+        """
+        if self.batch_supported is False:
+            return await self._publish_each(messages)
+
+        payload = {
+            "commands": [
+                {"publish": {"channel": channel, "data": data}}
+                for channel, data in messages
+            ]
+        }
+        try:
+            response = await self.get_client().post(self.batch_url, json=payload)
+        except httpx.HTTPError as e:
+            logger.error(f"Ошибка batch-публикации {len(messages)} сообщений: {e}")
+            CENTRIFUGO_FAILURES.inc(len(messages))
+            return [False] * len(messages)
+        if response.status_code == 404:
+            # Сервер старше v5: batch API нет
+            self._set_batch_supported(False)
+            return await self._publish_each(messages)
+        if response.status_code != 200:
+            logger.error(
+                f"Centrifugo отклонил batch из {len(messages)} сообщений: "
+                f"{response.status_code}"
+            )
+            CENTRIFUGO_FAILURES.inc(len(messages))
+            return [False] * len(messages)
+
+        replies = response.json().get("replies", [])
+        statuses = [not reply.get("error") for reply in replies]
+        # Команды без ответа считаем недоставленными
+        statuses += [False] * (len(messages) - len(statuses))
+        failed = statuses.count(False)
+        if failed:
+            CENTRIFUGO_FAILURES.inc(failed)
+        return statuses
+
+    async def _publish_each(self, messages: List[Tuple[str, str]]) -> List[bool]:
+        return list(
+            await asyncio.gather(
+                *(self.publish(channel, data) for channel, data in messages)
+            )
+        )
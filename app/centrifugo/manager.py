@@ -0,0 +1,20 @@
+from app.config import settings
+from app.centrifugo.client import CentrifugoClient
+from app.centrifugo.publisher import CentrifugoPublisher
+
+
+centrifugo_manager = CentrifugoClient(
+    url=settings.CENTRIFUGO_URL,
+    api_key=settings.CENTRIFUGO_API_KEY,
+    batch_url=settings.centrifugo_batch_url,
+    timeout=settings.CENTRIFUGO_TIMEOUT,
+    connect_timeout=settings.CENTRIFUGO_CONNECT_TIMEOUT,
+    max_connections=settings.CENTRIFUGO_MAX_CONNECTIONS,
+    max_keepalive_connections=settings.CENTRIFUGO_MAX_KEEPALIVE,
+)
+
+centrifugo_publisher = CentrifugoPublisher(
+    client=centrifugo_manager,
+    batch_size=settings.CENTRIFUGO_BATCH_SIZE,
+    max_delay=settings.CENTRIFUGO_BATCH_DELAY,
+)
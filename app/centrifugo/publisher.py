@@ -0,0 +1,136 @@
+import asyncio
+from loguru import logger
+from typing import List, Optional, Set, Tuple
+from app.centrifugo.client import CentrifugoClient
+from app.metrics.metrics import CENTRIFUGO_FAILURES
+
+QueueItem = Tuple[str, str, asyncio.Future]
+
+
+class CentrifugoPublisher:
+    """
+    Очередь публикаций, объединяющая сообщения из разных комнат в batch-запросы.
+
+    Пачка отправляется, когда в очереди набралось batch_size сообщений или
+    прошло max_delay секунд с момента поступления первого из них. Каждый
+    вызывающий получает собственный статус доставки.
+    """
+
+    def __init__(
+        self,
+        client: CentrifugoClient,
+        batch_size: int = 50,
+        max_delay: float = 0.005,
+        max_queue_size: int = 10000,
+    ):
+        self.client = client
+        self.batch_size = batch_size
+        self.max_delay = max_delay
+        self.max_queue_size = max_queue_size
+        self._queue: Optional[asyncio.Queue[QueueItem]] = None
+        self._batch_ready: Optional[asyncio.Event] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._in_flight: Set[asyncio.Task] = set()
+
+    async def start(self):
+        """Запускает фоновую задачу отправки пачек."""
+        if self._worker is None:
+            self._queue = asyncio.Queue(maxsize=self.max_queue_size)
+            self._batch_ready = asyncio.Event()
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Очередь публикаций Centrifugo запущена")
+
+    async def stop(self):
+        """Останавливает отправку, предварительно доставив накопленные сообщения."""
+        if self._worker is None:
+            return
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+
+        while not self._queue.empty():
+            await self._send(self._take_batch(self.batch_size))
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        logger.info("Очередь публикаций Centrifugo остановлена")
+
+    async def publish(self, channel: str, data: str) -> bool:
+        """
+        Ставит сообщение в очередь и ждет статуса его доставки.
+
+        Если очередь не запущена, сообщение публикуется напрямую.
+        """
+        if self._worker is None:
+            return await self.client.publish(channel, data)
+
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((channel, data, future))
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+        return await future
+
+    def publish_nowait(self, channel: str, data: str):
+        """Ставит сообщение в очередь, не дожидаясь статуса доставки."""
+        if self._worker is None:
+            task = asyncio.create_task(self.client.publish(channel, data))
+            self._in_flight.add(task)
+            task.add_done_callback(self._in_flight.discard)
+            return
+
+        future = asyncio.get_running_loop().create_future()
+        try:
+            self._queue.put_nowait((channel, data, future))
+        except asyncio.QueueFull:
+            logger.error(
+                f"Очередь публикаций переполнена, сообщение в {channel} отброшено"
+            )
+            CENTRIFUGO_FAILURES.inc()
+            return
+        if self._queue.qsize() >= self.batch_size:
+            self._batch_ready.set()
+
+    def _take_batch(self, limit: int) -> List[QueueItem]:
+        batch = []
+        while len(batch) < limit and not self._queue.empty():
+            batch.append(self._queue.get_nowait())
+        return batch
+
+    async def _run(self):
+        while True:
+            first = await self._queue.get()
+            try:
+                if self._queue.qsize() + 1 < self.batch_size:
+                    await asyncio.wait_for(self._batch_ready.wait(), self.max_delay)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                # Уже извлеченное сообщение должно быть доставлено и при остановке
+                self._spawn_send([first])
+                raise
+            self._batch_ready.clear()
+            self._spawn_send([first] + self._take_batch(self.batch_size - 1))
+
+    def _spawn_send(self, batch: List[QueueItem]):
+        # Отправка идет в фоне, чтобы следующая пачка собиралась параллельно
+        task = asyncio.create_task(self._send(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _send(self, batch: List[QueueItem]):
+        messages = [(channel, data) for channel, data, _ in batch]
+        try:
+            if len(messages) == 1:
+                statuses = [await self.client.publish(*messages[0])]
+            else:
+                statuses = await self.client.publish_batch(messages)
+        except Exception as e:
+            logger.error(f"Ошибка отправки пачки из {len(messages)} сообщений: {e}")
+            statuses = [False] * len(messages)
+            CENTRIFUGO_FAILURES.inc(len(messages))
+
+        for (_, _, future), status in zip(batch, statuses):
+            if not future.done():
+                future.set_result(status)
@@ -1,15 +1,147 @@
-from typing import List, TypeVar, Generic, Type
+import random
+from functools import wraps
+from time import perf_counter
+from typing import Any, Dict, Iterator, List, Sequence, Tuple, TypeVar, Generic, Type
 from pydantic import BaseModel
-from sqlalchemy.exc import SQLAlchemyError
+from sqlalchemy.dialects import postgresql, sqlite
 from sqlalchemy.future import select
-from sqlalchemy import update as sqlalchemy_update, delete as sqlalchemy_delete, func
+from sqlalchemy import (
+    bindparam,
+    insert as sqlalchemy_insert,
+    update as sqlalchemy_update,
+    delete as sqlalchemy_delete,
+    func,
+)
 from loguru import logger
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
 
+from app.config import settings
 from app.dao.database import Base
 
 T = TypeVar("T", bound=Base)
 
+# Сколько записей отправлять одним executemany в массовых операциях
+BULK_CHUNK_SIZE = 1000
+
+# INSERT с поддержкой ON CONFLICT для каждой поддерживаемой БД
+_UPSERT_INSERTS = {
+    "sqlite": sqlite.insert,
+    "postgresql": postgresql.insert,
+}
+
+
+def _group_rows(
+    rows: List[Dict[str, Any]], chunk_size: int
+) -> Iterator[Tuple[List[int], List[Dict[str, Any]]]]:
+    """
+    Раскладывает строки на пачки с одинаковым набором полей не длиннее chunk_size.
+
+    executemany требует одинаковых параметров у всех строк одного запроса.
+    Вместе с пачкой возвращаются исходные позиции ее строк.
+    """
+    groups: Dict[frozenset, List[int]] = {}
+    for position, row in enumerate(rows):
+        groups.setdefault(frozenset(row), []).append(position)
+    for positions in groups.values():
+        for start in range(0, len(positions), chunk_size):
+            chunk_positions = positions[start : start + chunk_size]
+            yield chunk_positions, [rows[position] for position in chunk_positions]
+
+
+def _describe(value: Any) -> Any:
+    """Короткое представление аргумента или результата для лога."""
+    if isinstance(value, BaseModel):
+        return value.model_dump(exclude_unset=True)
+    if isinstance(value, (list, tuple)):
+        return f"[{len(value)} шт.]"
+    if isinstance(value, Base):
+        return f"<{type(value).__name__}>"
+    return value
+
+
+def _logged(operation: str):
+    """
+    Логирует вызов метода DAO с его длительностью.
+
+    Ошибки и запросы дольше DAO_SLOW_QUERY_SECONDS логируются всегда,
+    успешные - лишь с вероятностью DAO_LOG_SAMPLE_RATE на уровне
+    DAO_LOG_LEVEL. Аргументы форматируются только при реальной записи в лог.
+    """
+
+    def decorator(func):
+        @wraps(func)
+        async def wrapper(self, *args, **kwargs):
+            started = perf_counter()
+            try:
+                result = await func(self, *args, **kwargs)
+            except Exception as e:
+                _log_call(
+                    self,
+                    operation,
+                    perf_counter() - started,
+                    "ERROR",
+                    "Ошибка {model}.{operation} за {duration} мс: {error}",
+                    args,
+                    kwargs,
+                    error=e,
+                )
+                raise
+
+            elapsed = perf_counter() - started
+            if elapsed >= settings.DAO_SLOW_QUERY_SECONDS:
+                _log_call(
+                    self,
+                    operation,
+                    elapsed,
+                    "WARNING",
+                    "Медленный запрос {model}.{operation}: {duration} мс",
+                    args,
+                    kwargs,
+                    result,
+                )
+            elif random.random() < settings.DAO_LOG_SAMPLE_RATE:
+                _log_call(
+                    self,
+                    operation,
+                    elapsed,
+                    settings.DAO_LOG_LEVEL,
+                    "{model}.{operation}: {duration} мс",
+                    args,
+                    kwargs,
+                    result,
+                )
+            return result
+
+        return wrapper
+
+    return decorator
+
+
+def _log_call(
+    dao, operation, elapsed, level, message, args, kwargs, result=None, error=None
+):
+    # Поля bind доступны структурированным обработчикам в record["extra"],
+    # а аргументы и результат форматируются, только если запись пройдет по уровню
+    message += "; аргументы: {arguments}"
+    if error is None:
+        message += "; результат: {result}"
+    logger.bind(
+        dao=dao.model.__name__,
+        operation=operation,
+        duration_ms=round(elapsed * 1000, 3),
+    ).opt(lazy=True).log(
+        level,
+        message,
+        model=lambda: dao.model.__name__,
+        operation=lambda: operation,
+        duration=lambda: f"{elapsed * 1000:.1f}",
+        error=lambda: error,
+        arguments=lambda: [_describe(arg) for arg in (*args, *kwargs.values())],
+        result=lambda: _describe(result),
+    )
+
 
 class BaseDAO(Generic[T]):
     model: Type[T] = None
@@ -19,154 +151,188 @@ class BaseDAO(Generic[T]):
         if self.model is None:
             raise ValueError("Модель должна быть указана в дочернем классе")
 
+    @_logged("find_one_or_none_by_id")
     async def find_one_or_none_by_id(self, data_id: int):
-        try:
-            query = select(self.model).filter_by(id=data_id)
-            result = await self._session.execute(query)
-            record = result.scalar_one_or_none()
-            log_message = f"Запись {self.model.__name__} с ID {data_id} {'найдена' if record else 'не найдена'}."
-            logger.info(log_message)
-            return record
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи с ID {data_id}: {e}")
-            raise
+        query = select(self.model).filter_by(id=data_id)
+        result = await self._session.execute(query)
+        return result.scalar_one_or_none()
 
+    @_logged("find_one_or_none")
     async def find_one_or_none(self, filters: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(
-            f"Поиск одной записи {self.model.__name__} по фильтрам: {filter_dict}"
-        )
-        try:
-            query = select(self.model).filter_by(**filter_dict)
-            result = await self._session.execute(query)
-            record = result.scalar_one_or_none()
-            log_message = f"Запись {'найдена' if record else 'не найдена'} по фильтрам: {filter_dict}"
-            logger.info(log_message)
-            return record
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при поиске записи по фильтрам {filter_dict}: {e}")
-            raise
+        query = select(self.model).filter_by(**filter_dict)
+        result = await self._session.execute(query)
+        return result.scalar_one_or_none()
 
+    @_logged("find_all")
     async def find_all(self, filters: BaseModel | None = None):
         filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
-        logger.info(
-            f"Поиск всех записей {self.model.__name__} по фильтрам: {filter_dict}"
-        )
-        try:
-            query = select(self.model).filter_by(**filter_dict)
-            result = await self._session.execute(query)
-            records = result.scalars().all()
-            logger.info(f"Найдено {len(records)} записей.")
-            return records
-        except SQLAlchemyError as e:
-            logger.error(
-                f"Ошибка при поиске всех записей по фильтрам {filter_dict}: {e}"
-            )
-            raise
+        query = select(self.model).filter_by(**filter_dict)
+        result = await self._session.execute(query)
+        return result.scalars().all()
 
+    @_logged("add")
     async def add(self, values: BaseModel):
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(
-            f"Добавление записи {self.model.__name__} с параметрами: {values_dict}"
-        )
-        try:
-            new_instance = self.model(**values_dict)
-            self._session.add(new_instance)
-            logger.info(f"Запись {self.model.__name__} успешно добавлена.")
-            await self._session.flush()
-            return new_instance
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при добавлении записи: {e}")
-            raise
-
-    async def add_many(self, instances: List[BaseModel]):
+        new_instance = self.model(**values_dict)
+        self._session.add(new_instance)
+        await self._session.flush()
+        return new_instance
+
+    @_logged("add_many")
+    async def add_many(
+        self, instances: List[BaseModel], chunk_size: int = BULK_CHUNK_SIZE
+    ):
         values_list = [item.model_dump(exclude_unset=True) for item in instances]
-        logger.info(
-            f"Добавление нескольких записей {self.model.__name__}. Количество: {len(values_list)}"
-        )
-        try:
-            new_instances = [self.model(**values) for values in values_list]
-            self._session.add_all(new_instances)
-            logger.info(f"Успешно добавлено {len(new_instances)} записей.")
-            await self._session.flush()
-            return new_instances
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при добавлении нескольких записей: {e}")
-            raise
+        # Один INSERT ... RETURNING на пачку вместо построения объектов по одному
+        await self._session.flush()
+        new_instances = [None] * len(values_list)
+        for positions, chunk in _group_rows(values_list, chunk_size):
+            result = await self._session.scalars(
+                sqlalchemy_insert(self.model).returning(
+                    self.model, sort_by_parameter_order=True
+                ),
+                chunk,
+            )
+            # Пачки идут по наборам полей, а результат - в порядке входных записей
+            for position, instance in zip(positions, result.all()):
+                new_instances[position] = instance
+        return new_instances
 
+    @_logged("update")
     async def update(self, filters: BaseModel, values: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
         values_dict = values.model_dump(exclude_unset=True)
-        logger.info(
-            f"Обновление записей {self.model.__name__} по фильтру: {filter_dict} с параметрами: {values_dict}"
+        query = (
+            sqlalchemy_update(self.model)
+            .where(*[getattr(self.model, k) == v for k, v in filter_dict.items()])
+            .values(**values_dict)
+            .execution_options(synchronize_session="fetch")
         )
-        try:
-            query = (
-                sqlalchemy_update(self.model)
-                .where(*[getattr(self.model, k) == v for k, v in filter_dict.items()])
-                .values(**values_dict)
-                .execution_options(synchronize_session="fetch")
-            )
-            result = await self._session.execute(query)
-            logger.info(f"Обновлено {result.rowcount} записей.")
-            await self._session.flush()
-            return result.rowcount
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при обновлении записей: {e}")
-            raise
+        result = await self._session.execute(query)
+        await self._session.flush()
+        return result.rowcount
 
+    @_logged("delete")
     async def delete(self, filters: BaseModel):
         filter_dict = filters.model_dump(exclude_unset=True)
-        logger.info(f"Удаление записей {self.model.__name__} по фильтру: {filter_dict}")
         if not filter_dict:
-            logger.error("Нужен хотя бы один фильтр для удаления.")
             raise ValueError("Нужен хотя бы один фильтр для удаления.")
-        try:
-            query = sqlalchemy_delete(self.model).filter_by(**filter_dict)
-            result = await self._session.execute(query)
-            logger.info(f"Удалено {result.rowcount} записей.")
-            await self._session.flush()
-            return result.rowcount
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при удалении записей: {e}")
-            raise
+        query = sqlalchemy_delete(self.model).filter_by(**filter_dict)
+        result = await self._session.execute(query)
+        await self._session.flush()
+        return result.rowcount
+
+    @_logged("find_ids_after")
+    async def find_ids_after(self, last_id: int | None, limit: int) -> List[int]:
+        """
+        Следующая страница id по возрастанию после last_id.
 
+        Постраничный обход по ключу без OFFSET: каждая страница читается
+        по индексу первичного ключа за одинаковое время.
+        """
+        query = select(self.model.id).order_by(self.model.id).limit(limit)
+        if last_id is not None:
+            query = query.where(self.model.id > last_id)
+        result = await self._session.execute(query)
+        return list(result.scalars().all())
+
+    @_logged("count")
     async def count(self, filters: BaseModel | None = None):
         filter_dict = filters.model_dump(exclude_unset=True) if filters else {}
-        logger.info(
-            f"Подсчет количества записей {self.model.__name__} по фильтру: {filter_dict}"
-        )
-        try:
-            query = select(func.count(self.model.id)).filter_by(**filter_dict)
-            result = await self._session.execute(query)
-            count = result.scalar()
-            logger.info(f"Найдено {count} записей.")
-            return count
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при подсчете записей: {e}")
-            raise
-
-    async def bulk_update(self, records: List[BaseModel]):
-        logger.info(f"Массовое обновление записей {self.model.__name__}")
-        try:
-            updated_count = 0
-            for record in records:
-                record_dict = record.model_dump(exclude_unset=True)
-                if "id" not in record_dict:
-                    continue
-
-                update_data = {k: v for k, v in record_dict.items() if k != "id"}
-                stmt = (
-                    sqlalchemy_update(self.model)
-                    .filter_by(id=record_dict["id"])
-                    .values(**update_data)
+        query = select(func.count(self.model.id)).filter_by(**filter_dict)
+        result = await self._session.execute(query)
+        return result.scalar()
+
+    @_logged("bulk_update")
+    async def bulk_update(
+        self, records: List[BaseModel], chunk_size: int = BULK_CHUNK_SIZE
+    ):
+        """
+        Обновляет записи по id пачками: один UPDATE с параметрами
+        выполняется через executemany для всей пачки.
+
+        Записи без id пропускаются. Загруженные в сессию объекты получают
+        новые значения, как при обычном update. Возвращает количество
+        обновленных строк; если драйвер не сообщает его для executemany
+        (asyncpg), возвращается количество отправленных записей.
+        """
+        rows = []
+        for record in records:
+            record_dict = record.model_dump(exclude_unset=True)
+            if "id" in record_dict and len(record_dict) > 1:
+                rows.append({f"b_{k}": v for k, v in record_dict.items()})
+        await self._session.flush()
+        table = self.model.__table__
+        updated_count = 0
+        for _, chunk in _group_rows(rows, chunk_size):
+            fields = [key[2:] for key in chunk[0] if key != "b_id"]
+            stmt = (
+                sqlalchemy_update(table)
+                .where(table.c.id == bindparam("b_id"))
+                .values({field: bindparam(f"b_{field}") for field in fields})
+            )
+            result = await self._session.execute(stmt, chunk)
+            updated_count += result.rowcount if result.rowcount >= 0 else len(chunk)
+            self._synchronize(chunk, fields)
+        return updated_count
+
+    def _synchronize(self, rows: List[Dict[str, Any]], fields: List[str]):
+        """
+        Переносит значения из UPDATE таблицы в уже загруженные объекты сессии.
+
+        UPDATE на уровне таблицы минует ORM, поэтому без этого объекты
+        в identity map остались бы со старыми значениями.
+        """
+        identity_map = self._session.identity_map
+        for row in rows:
+            instance = identity_map.get(identity_key(self.model, row["b_id"]))
+            if instance is None:
+                continue
+            for field in fields:
+                set_committed_value(instance, field, row[f"b_{field}"])
+
+    @_logged("upsert_many")
+    async def upsert_many(
+        self,
+        records: List[BaseModel],
+        conflict_fields: Sequence[str] = ("id",),
+        update_fields: Sequence[str] | None = None,
+        chunk_size: int = BULK_CHUNK_SIZE,
+    ):
+        """
+        Вставляет записи, а при конфликте по conflict_fields обновляет
+        существующие: INSERT ... ON CONFLICT DO UPDATE пачками через executemany.
+
+        Args:
+            records: Записи для вставки.
+            conflict_fields: Поля уникального ключа, по которому ищется конфликт.
+            update_fields: Поля, обновляемые при конфликте (по умолчанию все
+                переданные поля, кроме conflict_fields).
+            chunk_size: Сколько записей отправлять одним запросом.
+
+        Returns:
+            Количество отправленных записей.
+        """
+        dialect = self._session.get_bind().dialect.name
+        insert = _UPSERT_INSERTS.get(dialect)
+        if insert is None:
+            raise NotImplementedError(f"Upsert не поддерживается для БД {dialect}")
+
+        rows = [record.model_dump(exclude_unset=True) for record in records]
+        await self._session.flush()
+        table = self.model.__table__
+        for _, chunk in _group_rows(rows, chunk_size):
+            fields = update_fields or [
+                field for field in chunk[0] if field not in conflict_fields
+            ]
+            stmt = insert(table)
+            if fields:
+                stmt = stmt.on_conflict_do_update(
+                    index_elements=list(conflict_fields),
+                    set_={field: stmt.excluded[field] for field in fields},
                 )
-                result = await self._session.execute(stmt)
-                updated_count += result.rowcount
-
-            logger.info(f"Обновлено {updated_count} записей")
-            await self._session.flush()
-            return updated_count
-        except SQLAlchemyError as e:
-            logger.error(f"Ошибка при массовом обновлении: {e}")
-            raise
+            else:
+                stmt = stmt.on_conflict_do_nothing(index_elements=list(conflict_fields))
+            await self._session.execute(stmt, chunk)
+        return len(rows)
@@ -1,20 +1,14 @@
-import aiosqlite
-from app.config import settings
+from sqlalchemy.ext.asyncio import AsyncEngine
+from app.dao.database import Base, engine
+from app.dao import models  # noqa: F401 - регистрирует модели в Base.metadata
 
 
-async def create_users_table():
-    async with aiosqlite.connect(settings.DB_PATH) as db:
-        await db.execute(
-            """
-        CREATE TABLE IF NOT EXISTS users (
-            id INTEGER PRIMARY KEY,
-            username TEXT,
-            first_name TEXT,
-            last_name TEXT,
-            nickname TEXT NOT NULL,
-            gender TEXT NOT NULL,
-            age INTEGER NOT NULL
-        );
-        """
-        )
-        await db.commit()
+async def create_schema(db_engine: AsyncEngine = engine):
+    """
+    Создает недостающие таблицы по метаданным моделей.
+
+    Существующие таблицы не изменяются, поэтому вызов безопасен при каждом
+    запуске на любой поддерживаемой БД.
+    """
+    async with db_engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
@@ -1,9 +1,52 @@
+from sqlalchemy import event
 from sqlalchemy.orm import DeclarativeBase
 from sqlalchemy.ext.asyncio import AsyncAttrs, async_sessionmaker, create_async_engine, AsyncSession
 from app.config import settings
+from app.metrics.metrics import instrument_engine
 
-engine = create_async_engine(url=settings.DB_URL)
+def engine_options(url: str) -> dict:
+    """
+    Параметры движка для выбранной БД.
+
+    Для серверных БД (PostgreSQL через asyncpg) настраивается пул соединений,
+    общий для всех запросов процесса. SQLite использует пул по умолчанию.
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": True,
+    }
+
+
+engine = create_async_engine(url=settings.DB_URL, **engine_options(settings.DB_URL))
 async_session_maker = async_sessionmaker(engine, class_=AsyncSession)
+instrument_engine(engine, component=engine.dialect.name)
+
+# Применяются к каждому новому соединению с SQLite:
+# WAL позволяет читать во время записи, synchronous=NORMAL в режиме WAL
+# не теряет целостность и не ждет fsync на каждом коммите
+SQLITE_PRAGMAS = {
+    "journal_mode": "WAL",
+    "synchronous": "NORMAL",
+    "busy_timeout": settings.SQLITE_BUSY_TIMEOUT,
+    "cache_size": settings.SQLITE_CACHE_SIZE,
+    "mmap_size": settings.SQLITE_MMAP_SIZE,
+    "temp_store": "MEMORY",
+}
+
+
+if engine.dialect.name == "sqlite":
+
+    @event.listens_for(engine.sync_engine, "connect")
+    def set_sqlite_pragmas(dbapi_connection, connection_record):
+        cursor = dbapi_connection.cursor()
+        for pragma, value in SQLITE_PRAGMAS.items():
+            cursor.execute(f"PRAGMA {pragma}={value}")
+        cursor.close()
 
 
 class Base(AsyncAttrs, DeclarativeBase):
@@ -1,45 +1,48 @@
 from typing import Callable, Dict, Any, Awaitable
-from aiogram import BaseMiddleware
+from aiogram import BaseMiddleware, Dispatcher
+from aiogram.dispatcher.event.handler import HandlerObject
 from aiogram.types import Message, CallbackQuery
 from app.dao.database import async_session_maker
 
+# Имя аргумента хендлера, в который передается сессия
+SESSION_KEY = "session"
+
+
+class DatabaseMiddleware(BaseMiddleware):
+    """
+    Открывает сессию БД только для хендлеров, которые ее запрашивают.
+
+    Сессия передается в аргумент session и не коммитится: она служит только
+    для чтения, а записи хендлеры выполняют через db_writer:
+
+        @router.message(F.text)
+        async def handler(message: Message, session: AsyncSession): ...
+
+    Работает как inner middleware, когда хендлер уже выбран: обновления,
+    для которых сессия не нужна, не открывают соединение с БД.
+    """
 
-class BaseDatabaseMiddleware(BaseMiddleware):
     async def __call__(
         self,
         handler: Callable[[Message | CallbackQuery, Dict[str, Any]], Awaitable[Any]],
         event: Message | CallbackQuery,
         data: Dict[str, Any],
     ) -> Any:
+        handler_object: HandlerObject | None = data.get("handler")
+        if handler_object is None or SESSION_KEY not in handler_object.params:
+            return await handler(event, data)
+
         async with async_session_maker() as session:
-            self.set_session(data, session)
+            data[SESSION_KEY] = session
             try:
-                result = await handler(event, data)
-                await self.after_handler(session)
-                return result
+                return await handler(event, data)
             except Exception as e:
                 await session.rollback()
                 raise e
-            finally:
-                await session.close()
-
-    def set_session(self, data: Dict[str, Any], session) -> None:
-        """Метод для установки сессии в словарь данных."""
-        raise NotImplementedError("Этот метод должен быть реализован в подклассах.")
-
-    async def after_handler(self, session) -> None:
-        """Метод для выполнения действий после вызова хендлера (например, коммит)."""
-        pass
-
-
-class DatabaseMiddlewareWithoutCommit(BaseDatabaseMiddleware):
-    def set_session(self, data: Dict[str, Any], session) -> None:
-        data["session_without_commit"] = session
-
 
-class DatabaseMiddlewareWithCommit(BaseDatabaseMiddleware):
-    def set_session(self, data: Dict[str, Any], session) -> None:
-        data["session_with_commit"] = session
 
-    async def after_handler(self, session) -> None:
-        await session.commit()
+def setup_database_middleware(dp: Dispatcher) -> None:
+    """Регистрирует DatabaseMiddleware для сообщений и колбэков всех роутеров."""
+    middleware = DatabaseMiddleware()
+    dp.message.middleware.register(middleware)
+    dp.callback_query.middleware.register(middleware)
@@ -0,0 +1,101 @@
+import asyncio
+from loguru import logger
+from typing import Awaitable, Callable, Optional, Tuple, TypeVar
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker
+from app.config import settings
+from app.dao.database import engine
+
+T = TypeVar("T")
+Job = Callable[[AsyncSession], Awaitable[T]]
+QueueItem = Tuple[Job, asyncio.Future]
+
+
+class DatabaseWriter:
+    """
+    Единственная задача, выполняющая все записи в БД по очереди.
+
+    Каждая запись выполняется в своей транзакции, которая коммитится сразу
+    после выполнения задания. SQLite допускает только одного писателя, поэтому
+    записи не конкурируют за блокировку и не держат ее, пока обработчик
+    отвечает пользователю, а читатели в режиме WAL им не мешают.
+
+    С serialize=False (серверные БД с пулом соединений) задача не
+    запускается и записи выполняются сразу в вызывающей корутине.
+    """
+
+    def __init__(
+        self,
+        session_maker: async_sessionmaker[AsyncSession],
+        max_queue_size: int = 1000,
+        serialize: bool = True,
+    ):
+        self.session_maker = session_maker
+        self.serialize = serialize
+        self._queue: asyncio.Queue[QueueItem] = asyncio.Queue(maxsize=max_queue_size)
+        self._worker: Optional[asyncio.Task] = None
+
+    async def start(self):
+        """Запускает задачу записи."""
+        if self.serialize and self._worker is None:
+            self._worker = asyncio.create_task(self._run())
+            logger.info("Очередь записи в БД запущена")
+
+    async def stop(self):
+        """Выполняет оставшиеся в очереди записи и останавливает задачу."""
+        if self._worker is None:
+            return
+        await self._queue.join()
+        self._worker.cancel()
+        try:
+            await self._worker
+        except asyncio.CancelledError:
+            pass
+        self._worker = None
+        logger.info("Очередь записи в БД остановлена")
+
+    async def run(self, job: Job) -> T:
+        """
+        Выполняет job(session) в задаче записи и возвращает его результат.
+
+        Транзакция коммитится после job, при ошибке откатывается, а
+        исключение передается вызывающему. Объекты, возвращенные job, не
+        истекают после коммита, но уже не привязаны к сессии. Если задача
+        записи не запущена, job выполняется сразу.
+        """
+        if self._worker is None:
+            return await self._execute(job)
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((job, future))
+        return await future
+
+    async def _execute(self, job: Job) -> T:
+        async with self.session_maker() as session:
+            try:
+                result = await job(session)
+                await session.commit()
+                return result
+            except Exception:
+                await session.rollback()
+                raise
+
+    async def _run(self):
+        while True:
+            job, future = await self._queue.get()
+            try:
+                result = await self._execute(job)
+            except Exception as e:
+                logger.error(f"Ошибка записи в БД: {e}")
+                if not future.done():
+                    future.set_exception(e)
+            else:
+                if not future.done():
+                    future.set_result(result)
+            finally:
+                self._queue.task_done()
+
+
+db_writer = DatabaseWriter(
+    async_sessionmaker(engine, class_=AsyncSession, expire_on_commit=False),
+    max_queue_size=settings.DB_WRITE_QUEUE_SIZE,
+    serialize=engine.dialect.name == "sqlite",
+)
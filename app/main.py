@@ -1,19 +1,37 @@
 from contextlib import asynccontextmanager
 from fastapi.middleware.cors import CORSMiddleware
-from app.bot.create_bot import dp, start_bot, bot, stop_bot
+from app.bot.create_bot import dp, start_bot, bot, stop_bot, message_sender
 from app.config import settings
 from aiogram.types import Update
-from fastapi import FastAPI, Request
+from fastapi import FastAPI, Request, Response
 from loguru import logger
 from app.api.router import router as api_router
-from app.redis_dao.manager import redis_manager
-
+from app.metrics.router import router as metrics_router
+from app.api.reaper import room_reaper
+from app.api.cleanup import redis_cleanup
+from app.api.rooms import fill_matching_engine, run_migrations
+from app.redis_dao.manager import redis_shards
+from app.centrifugo.manager import centrifugo_manager, centrifugo_publisher
+from app.dao.writer import db_writer
+from app.bot.update_pool import update_pool
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("Бот запущен...")
-    await redis_manager.connect()
+    # Основной узел Redis входит в redis_shards и подключается вместе с ним
+    await redis_shards.connect()
+    # Разовые миграции данных; выполненные отмечаются в Redis и пропускаются
+    await run_migrations(redis_shards)
+    if settings.MATCH_ENGINE == "memory":
+        waiting = await fill_matching_engine(redis_shards)
+        logger.info(f"Индекс подбора в памяти заполнен: {waiting} ожидающих")
+    await centrifugo_manager.connect()
+    await centrifugo_publisher.start()
+    await room_reaper.start()
+    await db_writer.start()
+    await message_sender.start()
     await start_bot()
+    await update_pool.start()
     app.include_router(api_router)
     webhook_url = settings.hook_url
     await bot.set_webhook(url=webhook_url,
@@ -22,8 +40,15 @@ async def lifespan(app: FastAPI):
     logger.success(f"Вебхук установлен: {webhook_url}")
     yield
     logger.info("Бот остановлен...")
+    await update_pool.stop()
     await stop_bot()
-    await redis_manager.close()
+    await message_sender.stop()
+    await db_writer.stop()
+    await room_reaper.stop()
+    await redis_cleanup.stop()
+    await centrifugo_publisher.stop()
+    await centrifugo_manager.close()
+    await redis_shards.close()
 
 
 app = FastAPI(lifespan=lifespan)
@@ -35,15 +60,19 @@ app.add_middleware(
     allow_methods=["*"],
     allow_headers=["*"]
 )
+app.include_router(metrics_router)
 
 
 @app.post("/webhook")
-async def webhook(request: Request) -> None:
+async def webhook(request: Request) -> Response | None:
     logger.info("Получен запрос с вебхука.")
+    # Обновление обрабатывается пулом воркеров, а Telegram получает ответ сразу
     try:
         update_data = await request.json()
         update = Update.model_validate(update_data, context={"bot": bot})
-        await dp.feed_update(bot, update)
-        logger.info("Обновление успешно обработано.")
     except Exception as e:
-        logger.error(f"Ошибка при обработке обновления с вебхука: {e}")
+        logger.error(f"Ошибка при разборе обновления с вебхука: {e}")
+        return
+    if not await update_pool.submit(update):
+        # Очередь переполнена: Telegram повторит доставку позже
+        return Response(status_code=503)
@@ -0,0 +1,159 @@
+from contextlib import contextmanager
+from contextvars import ContextVar
+from functools import wraps
+from time import perf_counter
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+from prometheus_client import Counter, Gauge, Histogram
+from sqlalchemy import event
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+# Границы корзин длительности запросов в секундах
+REQUEST_BUCKETS = (
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+    5.0,
+)
+
+REQUEST_TIME = Histogram(
+    "tetatet_request_seconds",
+    "Время обработки запроса",
+    ["handler"],
+    buckets=REQUEST_BUCKETS,
+)
+COMPONENT_TIME = Histogram(
+    "tetatet_request_component_seconds",
+    "Время, проведенное запросом в Redis, БД, JWT и Centrifugo",
+    ["handler", "component"],
+    buckets=REQUEST_BUCKETS,
+)
+MATCHES = Counter("tetatet_matches_total", "Найдено пар")
+ROOMS_CREATED = Counter("tetatet_rooms_created_total", "Создано ожидающих комнат")
+# reason: "cleared" - комната удалена через /api/clear_room, "expired" -
+# ожидающая комната истекла по TTL и вычищена из индекса. Комнаты с парой,
+# истекшие по TTL без clear_room, не видны ни одному процессу и не считаются
+ROOMS_CLOSED = Counter("tetatet_rooms_closed_total", "Закрыто комнат", ["reason"])
+CENTRIFUGO_FAILURES = Counter(
+    "tetatet_centrifugo_publish_failures_total",
+    "Сообщения, которые не удалось опубликовать в Centrifugo",
+)
+# Границы корзин задержек Redis в секундах
+REDIS_BUCKETS = (
+    0.0005,
+    0.001,
+    0.0025,
+    0.005,
+    0.01,
+    0.025,
+    0.05,
+    0.1,
+    0.25,
+    0.5,
+    1.0,
+    2.5,
+)
+REDIS_COMMAND_TIME = Histogram(
+    "tetatet_redis_command_seconds",
+    "Задержка команд Redis, включая ожидание соединения",
+    ["node", "command"],
+    buckets=REDIS_BUCKETS,
+)
+REDIS_COMMAND_ERRORS = Counter(
+    "tetatet_redis_command_errors_total",
+    "Команды Redis, завершившиеся ошибкой",
+    ["node", "command"],
+)
+REDIS_POOL_WAIT = Histogram(
+    "tetatet_redis_pool_wait_seconds",
+    "Ожидание свободного соединения из пула Redis",
+    ["node"],
+    buckets=REDIS_BUCKETS,
+)
+REDIS_POOL_TIMEOUTS = Counter(
+    "tetatet_redis_pool_timeouts_total",
+    "Свободное соединение из пула Redis не появилось за pool_timeout",
+    ["node"],
+)
+WAITING_ROOMS = Gauge(
+    "tetatet_waiting_rooms",
+    "Ожидающие партнера пользователи по полу и искомому полу",
+    ["gender", "find_gender"],
+)
+
+# Время по компонентам в рамках текущего запроса
+_components: ContextVar[Optional[Dict[str, float]]] = ContextVar(
+    "metrics_components", default=None
+)
+
+T = TypeVar("T")
+
+
+def add_time(component: str, seconds: float):
+    """Засчитывает время компоненту текущего запроса; вне запроса ничего не делает."""
+    components = _components.get()
+    if components is not None:
+        components[component] = components.get(component, 0.0) + seconds
+
+
+@contextmanager
+def track(component: str):
+    """Засчитывает время выполнения блока компоненту текущего запроса."""
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        add_time(component, perf_counter() - started)
+
+
+@contextmanager
+def request_timer(handler: str):
+    """
+    Замеряет длительность обработки запроса и время, проведенное им в
+    каждом компоненте.
+    """
+    components: Dict[str, float] = {}
+    token = _components.set(components)
+    started = perf_counter()
+    try:
+        yield
+    finally:
+        REQUEST_TIME.labels(handler).observe(perf_counter() - started)
+        _components.reset(token)
+        for component, seconds in components.items():
+            COMPONENT_TIME.labels(handler, component).observe(seconds)
+
+
+def instrument_engine(engine: AsyncEngine, component: str = "db"):
+    """Засчитывает время выполнения SQL-запросов компоненту текущего запроса."""
+
+    @event.listens_for(engine.sync_engine, "before_cursor_execute")
+    def before_cursor_execute(
+        conn, cursor, statement, parameters, context, executemany
+    ):
+        conn.info.setdefault("query_started", []).append(perf_counter())
+
+    @event.listens_for(engine.sync_engine, "after_cursor_execute")
+    def after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+        add_time(component, perf_counter() - conn.info["query_started"].pop())
+
+
+def timed(handler: str):
+    """Декоратор обработчика запроса, оборачивающий его в request_timer."""
+
+    def decorator(func: Callable[..., Awaitable[T]]) -> Callable[..., Awaitable[T]]:
+        @wraps(func)
+        async def wrapper(*args, **kwargs) -> T:
+            with request_timer(handler):
+                return await func(*args, **kwargs)
+
+        return wrapper
+
+    return decorator
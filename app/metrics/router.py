@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Response
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from prometheus_client.registry import Collector
+from app.api.matching import FIND_GENDERS, GENDERS
+from app.api.rooms import count_waiting_rooms
+from app.metrics.metrics import WAITING_ROOMS
+from app.redis_dao.manager import get_redis_shards, redis_shards
+from app.redis_dao.shards import ShardedRedis
+
+router = APIRouter(tags=["Метрики"])
+
+
+class RedisCollector(Collector):
+    """
+    Отдает в Prometheus состояние пулов всех узлов Redis в момент сбора.
+
+    Задержки команд и ожидание соединения пишутся в гистограммы
+    app.metrics.metrics при каждой команде.
+    """
+
+    def __init__(self, shards: ShardedRedis):
+        self.shards = shards
+
+    def collect(self):
+        connections = GaugeMetricFamily(
+            "tetatet_redis_pool_connections",
+            "Соединения пула Redis по состоянию",
+            labels=["node", "state"],
+        )
+        for name, node in self.shards.nodes.items():
+            pool = node.pool_stats()
+            if pool is not None:
+                for state in ("in_use", "idle", "waiting"):
+                    connections.add_metric([name, state], pool[state])
+        yield connections
+
+
+REGISTRY.register(RedisCollector(redis_shards))
+
+
+@router.get("/metrics")
+async def metrics(shards: ShardedRedis = Depends(get_redis_shards)):
+    # Число ожидающих считается в момент сбора: ZCARD по всем шардам индекса
+    waiting = await count_waiting_rooms(shards)
+    for gender in GENDERS:
+        for find_gender in FIND_GENDERS:
+            WAITING_ROOMS.labels(gender, find_gender).set(
+                waiting.get((gender, find_gender), 0)
+            )
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
@@ -1,23 +1,115 @@
 import json
+from time import perf_counter
 from redis.asyncio import Redis
 from loguru import logger
-from typing import Any, Callable, Awaitable
+from app.metrics.metrics import add_time
+from typing import (
+    Any,
+    AsyncIterator,
+    Callable,
+    Awaitable,
+    Iterable,
+    List,
+    Optional,
+    Tuple,
+)
+
+# Сколько ключей SCAN просматривает за один вызов по умолчанию
+SCAN_BATCH_SIZE = 1000
+# Сколько ключей удалять одной командой UNLINK
+UNLINK_CHUNK_SIZE = 100
 
 
 class CustomRedis(Redis):
     """Расширенный класс Redis с дополнительными методами"""
 
+    async def execute_command(self, *args, **options):
+        # Пул RedisClient собирает метрики; у прочих пулов их нет
+        metrics = getattr(self.connection_pool, "metrics", None)
+        started = perf_counter()
+        failed = True
+        try:
+            result = await super().execute_command(*args, **options)
+            failed = False
+            return result
+        finally:
+            elapsed = perf_counter() - started
+            add_time("redis", elapsed)
+            if metrics is not None:
+                metrics.observe_command(str(args[0]).upper(), elapsed, failed)
+
+    async def run_pipeline(
+        self, commands: Iterable[Tuple[Any, ...]], transaction: bool = False
+    ) -> List[Any]:
+        """
+        Выполняет несколько команд за один запрос к Redis.
+
+        Args:
+            commands: Команды в виде кортежей (имя команды, *аргументы),
+                например ("EXPIRE", key, 60).
+            transaction: Выполнить команды в MULTI/EXEC.
+
+        Returns:
+            Результаты команд в том же порядке.
+        """
+        metrics = getattr(self.connection_pool, "metrics", None)
+        async with self.pipeline(transaction=transaction) as pipe:
+            for command in commands:
+                pipe.execute_command(*command)
+            if not len(pipe):
+                return []
+            started = perf_counter()
+            failed = True
+            try:
+                results = await pipe.execute()
+                failed = False
+                return results
+            finally:
+                elapsed = perf_counter() - started
+                add_time("redis", elapsed)
+                if metrics is not None:
+                    metrics.observe_command("PIPELINE", elapsed, failed)
+
     async def delete_key(self, key: str):
         """Удаляет ключ из Redis."""
         await self.delete(key)
         logger.info(f"Ключ {key} удален")
 
-    async def delete_keys_by_prefix(self, prefix: str):
-        """Удаляет ключи, начинающиеся с указанного префикса."""
-        keys = await self.keys(prefix + '*')
-        if keys:
-            await self.delete(*keys)
-            logger.info(f"Удалены ключи, начинающиеся с {prefix}")
+    async def delete_keys_by_prefix(
+        self, prefix: str, batch_size: int = SCAN_BATCH_SIZE
+    ) -> int:
+        """
+        Удаляет ключи, начинающиеся с указанного префикса.
+
+        Ключи перебираются через SCAN и удаляются пачками через UNLINK в
+        конвейере, поэтому сервер не блокируется ни на обходе, ни на удалении.
+
+        Args:
+            prefix: Префикс удаляемых ключей.
+            batch_size: Сколько ключей просматривать и удалять за один запрос.
+
+        Returns:
+            Количество удаленных ключей.
+        """
+        deleted = 0
+        async for keys in self.iter_key_batches(prefix + '*', batch_size):
+            deleted += await self.unlink_keys(keys)
+        if deleted:
+            logger.info(f"Удалено {deleted} ключей, начинающихся с {prefix}")
+        return deleted
+
+    async def unlink_keys(self, keys: List[bytes]) -> int:
+        """
+        Удаляет ключи через UNLINK и возвращает количество удаленных.
+
+        Ключи уходят одним запросом, но короткими командами UNLINK, чтобы ни
+        одна из них надолго не занимала сервер.
+        """
+        results = await self.run_pipeline(
+            ("UNLINK", *keys[start:start + UNLINK_CHUNK_SIZE])
+            for start in range(0, len(keys), UNLINK_CHUNK_SIZE)
+        )
+        return sum(results)
 
     async def delete_all_keys(self):
         """Удаляет все ключи из текущей базы данных Redis."""
@@ -47,9 +139,50 @@ class CustomRedis(Redis):
         """Проверяет, существует ли ключ в Redis."""
         return await super().exists(key)
 
-    async def get_keys(self, pattern: str = '*'):
-        """Возвращает список ключей, соответствующих шаблону."""
-        return await self.keys(pattern)
+    async def get_keys(
+        self, pattern: str = '*', batch_size: int = SCAN_BATCH_SIZE
+    ) -> List[bytes]:
+        """
+        Возвращает список ключей, соответствующих шаблону.
+
+        Для больших выборок лучше использовать iter_keys, не собирающий
+        все ключи в памяти.
+        """
+        return [key async for key in self.iter_keys(pattern, batch_size)]
+
+    async def iter_keys(
+        self,
+        pattern: str = '*',
+        batch_size: int = SCAN_BATCH_SIZE,
+        key_type: Optional[str] = None,
+    ) -> AsyncIterator[bytes]:
+        """
+        Перебирает ключи, соответствующие шаблону, через SCAN.
+
+        В отличие от KEYS не блокирует сервер на время обхода всей базы.
+        Ключ, измененный во время обхода, может быть возвращен повторно.
+
+        Args:
+            pattern: Шаблон ключей.
+            batch_size: Подсказка COUNT для SCAN - сколько ключей
+                просматривать за один вызов.
+            key_type: Возвращать только ключи этого типа (string, hash, zset...).
+        """
+        async for key in self.scan_iter(match=pattern, count=batch_size, _type=key_type):
+            yield key
+
+    async def iter_key_batches(
+        self, pattern: str = '*', batch_size: int = SCAN_BATCH_SIZE
+    ) -> AsyncIterator[List[bytes]]:
+        """Перебирает ключи, соответствующие шаблону, пачками не больше batch_size."""
+        batch = []
+        async for key in self.iter_keys(pattern, batch_size):
+            batch.append(key)
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
 
     async def get_cached_data(
         self,
@@ -5,13 +5,48 @@ from app.redis_dao.custom_redis import CustomRedis
 from functools import wraps
 from typing import Callable, Awaitable, Any
 from loguru import logger
+from redis.exceptions import RedisError
+from app.redis_dao.local_cache import LocalTTLCache
+from app.redis_dao.shards import ShardedRedis
 
+# Пространство имен ключей кэша в Redis
+CACHE_PREFIX = "cache:"
+
+# Настройки пула соединений, общие для всех узлов
+_pool_options = dict(
+    max_connections=settings.REDIS_MAX_CONNECTIONS,
+    pool_timeout=settings.REDIS_POOL_TIMEOUT,
+    socket_timeout=settings.REDIS_SOCKET_TIMEOUT,
+    socket_connect_timeout=settings.REDIS_SOCKET_CONNECT_TIMEOUT,
+    socket_keepalive=settings.REDIS_SOCKET_KEEPALIVE,
+    health_check_interval=settings.REDIS_HEALTH_CHECK_INTERVAL,
+)
 
 redis_manager = RedisClient(
     host=settings.REDIS_HOST,
     port=settings.REDIS_PORT,
     password=settings.REDIS_PASSWORD,
     ssl_flag=settings.REDIS_SSL,
+    **_pool_options,
+)
+
+
+# Основной узел хранит все остальные данные; дополнительные узлы
+# используются только для комнат и индексов подбора
+redis_shards = ShardedRedis(
+    {
+        f"{settings.REDIS_HOST}:{settings.REDIS_PORT}": redis_manager,
+        **{
+            node: RedisClient(
+                host=node.rsplit(":", 1)[0],
+                port=int(node.rsplit(":", 1)[1]),
+                password=settings.REDIS_PASSWORD,
+                ssl_flag=settings.REDIS_SSL,
+                **_pool_options,
+            )
+            for node in settings.REDIS_SHARD_NODES
+        },
+    }
 )
 
 
@@ -20,21 +55,46 @@ async def get_redis() -> CustomRedis:
     return redis_manager.get_client()
 
 
-def cached(cache_key: str, ttl: int = 1800):
+async def get_redis_shards() -> ShardedRedis:
+    """Функция зависимости для получения узлов Redis с комнатами"""
+    return redis_shards
+
+
+def cached(
+    cache_key: str,
+    ttl: int = 1800,
+    local_maxsize: int = 0,
+    local_ttl: float = 30,
+):
     """
     Декоратор для кэширования результатов функции.
 
     Args:
         cache_key: Ключ для кэширования данных. Поддерживает форматирование строки с использованием параметров функции.
+            В Redis ключ хранится с префиксом CACHE_PREFIX.
         ttl: Время жизни кэша в секундах (по умолчанию 30 минут).
+        local_maxsize: Размер локального LRU-кэша в памяти процесса перед Redis (0 - не использовать).
+        local_ttl: Время жизни записей локального кэша в секундах.
+
+    У обернутой функции появляется корутина invalidate(**kwargs), удаляющая
+    запись из обоих уровней кэша. Остальные процессы увидят изменения не позже
+    чем через local_ttl секунд.
     """
 
+    key_template = f"{CACHE_PREFIX}{cache_key}"
+
     def decorator(func: Callable[..., Awaitable[Any]]):
+        local_cache = (
+            LocalTTLCache(maxsize=local_maxsize, ttl=local_ttl)
+            if local_maxsize
+            else None
+        )
+
         @wraps(func)
         async def wrapper(*args, **kwargs):
             try:
                 # Форматируем ключ кэша, используя все доступные параметры
-                formatted_key = cache_key.format(**kwargs)
+                formatted_key = key_template.format(**kwargs)
             except KeyError as e:
                 logger.error(f"Ошибка форматирования ключа кэша: {e}")
                 # В случае ошибки форматирования возвращаем результат без кэширования
@@ -43,8 +103,18 @@ def cached(cache_key: str, ttl: int = 1800):
                 logger.error(f"Неожиданная ошибка при работе с кэшем: {e}")
                 return await func(*args, **kwargs)
 
+            if local_cache is not None:
+                found, result = local_cache.get(formatted_key)
+                if found:
+                    return result
+
             try:
                 redis = await get_redis()
+            except RuntimeError as e:
+                logger.error(f"Ошибка при работе с Redis: {e}")
+                return await func(*args, **kwargs)
+
+            try:
                 result = await redis.get_cached_data(
                     cache_key=formatted_key,
                     fetch_data_func=func,
@@ -52,16 +122,31 @@ def cached(cache_key: str, ttl: int = 1800):
                     *args,
                     **kwargs,
                 )
-                if result is None:
-                    logger.warning(
-                        f"Получено пустое значение из кэша для ключа {formatted_key}"
-                    )
-                return result
-            except Exception as e:
+            except RedisError as e:
                 logger.error(f"Ошибка при работе с Redis: {e}")
                 # В случае ошибки Redis возвращаем результат без кэширования
                 return await func(*args, **kwargs)
 
+            if result is None:
+                logger.warning(
+                    f"Получено пустое значение из кэша для ключа {formatted_key}"
+                )
+            elif local_cache is not None:
+                local_cache.set(formatted_key, result)
+            return result
+
+        async def invalidate(**kwargs):
+            """Удаляет закэшированный результат для указанных параметров."""
+            formatted_key = key_template.format(**kwargs)
+            if local_cache is not None:
+                local_cache.delete(formatted_key)
+            try:
+                redis = await get_redis()
+                await redis.delete(formatted_key)
+            except (RuntimeError, RedisError) as e:
+                logger.error(f"Ошибка инвалидации кэша для ключа {formatted_key}: {e}")
+
+        wrapper.invalidate = invalidate
         return wrapper
 
     return decorator
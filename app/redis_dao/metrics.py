@@ -0,0 +1,96 @@
+import asyncio
+from time import perf_counter
+from typing import Any, Dict
+from prometheus_client import Histogram
+from redis.asyncio import BlockingConnectionPool
+from redis.exceptions import ConnectionError
+from app.metrics.metrics import (
+    REDIS_COMMAND_ERRORS,
+    REDIS_COMMAND_TIME,
+    REDIS_POOL_TIMEOUTS,
+    REDIS_POOL_WAIT,
+)
+
+
+def _totals(metric, **labels) -> Dict[str, Any]:
+    """Количество и сумма наблюдений метрики по совпадающим меткам."""
+    totals: Dict[str, Any] = {}
+    for family in metric.collect():
+        for sample in family.samples:
+            if any(sample.labels.get(k) != v for k, v in labels.items()):
+                continue
+            key = sample.labels.get("command", "")
+            if sample.name.endswith("_count"):
+                totals.setdefault(key, {})["count"] = int(sample.value)
+            elif sample.name.endswith("_sum"):
+                totals.setdefault(key, {})["sum"] = sample.value
+            elif sample.name.endswith("_total"):
+                totals[key] = int(sample.value)
+    return totals
+
+
+class RedisMetrics:
+    """
+    Метрики клиента Redis одного узла: задержки команд и ожидание соединения
+    из пула. Значения пишутся в метрики Prometheus с меткой node.
+    """
+
+    def __init__(self, node: str):
+        self.node = node
+        self.waiting = 0
+        self.pool_wait = REDIS_POOL_WAIT.labels(node)
+        self.pool_timeouts = REDIS_POOL_TIMEOUTS.labels(node)
+        self._commands: Dict[str, Histogram] = {}
+
+    def observe_command(self, command: str, seconds: float, failed: bool = False):
+        histogram = self._commands.get(command)
+        if histogram is None:
+            histogram = self._commands[command] = REDIS_COMMAND_TIME.labels(
+                self.node, command
+            )
+        histogram.observe(seconds)
+        if failed:
+            REDIS_COMMAND_ERRORS.labels(self.node, command).inc()
+
+    def snapshot(self) -> Dict[str, Any]:
+        """Количество и сумма задержек команд, ошибки и ожидание пула узла."""
+        return {
+            "pool_wait": _totals(REDIS_POOL_WAIT, node=self.node).get("", {}),
+            "pool_timeouts": _totals(REDIS_POOL_TIMEOUTS, node=self.node).get("", 0),
+            "commands": _totals(REDIS_COMMAND_TIME, node=self.node),
+            "errors": _totals(REDIS_COMMAND_ERRORS, node=self.node),
+        }
+
+
+class InstrumentedConnectionPool(BlockingConnectionPool):
+    """
+    Пул соединений, который при нехватке соединений ждет освобождения
+    одного из них (не дольше timeout) и записывает время ожидания в метрики.
+    """
+
+    def __init__(self, *args, metrics: RedisMetrics, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.metrics = metrics
+
+    async def get_connection(self, command_name, *keys, **options):
+        self.metrics.waiting += 1
+        started = perf_counter()
+        try:
+            return await super().get_connection(command_name, *keys, **options)
+        except ConnectionError as e:
+            # Свободное соединение так и не появилось за timeout секунд
+            if isinstance(e.__cause__, asyncio.TimeoutError):
+                self.metrics.pool_timeouts.inc()
+            raise
+        finally:
+            self.metrics.waiting -= 1
+            self.metrics.pool_wait.observe(perf_counter() - started)
+
+    def stats(self) -> Dict[str, int]:
+        """Занятые, свободные и ожидаемые соединения пула."""
+        return {
+            "in_use": len(self._in_use_connections),
+            "idle": len(self._available_connections),
+            "waiting": self.metrics.waiting,
+            "max": self.max_connections,
+        }
@@ -1,6 +1,8 @@
 from loguru import logger
-from typing import Optional
+from typing import Any, Dict, Optional
+from redis.asyncio import SSLConnection
 from app.redis_dao.custom_redis import CustomRedis
+from app.redis_dao.metrics import InstrumentedConnectionPool, RedisMetrics
 
 
 class RedisClient:
@@ -14,6 +16,12 @@ class RedisClient:
         ssl_cert_reqs: str = "none",
         password: str | None = None,
         user: str = "default",
+        max_connections: int = 100,
+        pool_timeout: float = 5.0,
+        socket_timeout: float = 5.0,
+        socket_connect_timeout: float = 2.0,
+        socket_keepalive: bool = True,
+        health_check_interval: int = 30,
     ):
         self.host = host
         self.port = port
@@ -21,22 +29,45 @@ class RedisClient:
         self.ssl_flag = ssl_flag
         self.user = user
         self.ssl_cert_reqs = ssl_cert_reqs
+        self.max_connections = max_connections
+        self.pool_timeout = pool_timeout
+        self.socket_timeout = socket_timeout
+        self.socket_connect_timeout = socket_connect_timeout
+        self.socket_keepalive = socket_keepalive
+        self.health_check_interval = health_check_interval
+        self.metrics = RedisMetrics(f"{host}:{port}")
         self._client: Optional[CustomRedis] = None
 
     async def connect(self):
         """Создает и сохраняет подключение к Redis."""
         if self._client is None:
             try:
-                self._client = CustomRedis(
+                ssl_options = (
+                    {
+                        "connection_class": SSLConnection,
+                        "ssl_cert_reqs": self.ssl_cert_reqs,
+                    }
+                    if self.ssl_flag
+                    else {}
+                )
+                # При исчерпании пула команда ждет свободное соединение
+                # не дольше pool_timeout секунд, а не падает сразу
+                pool = InstrumentedConnectionPool(
+                    metrics=self.metrics,
+                    max_connections=self.max_connections,
+                    timeout=self.pool_timeout,
                     host=self.host,
                     port=self.port,
                     password=self.password,
-                    ssl=self.ssl_flag,
                     username=self.user,
-                    ssl_cert_reqs=self.ssl_cert_reqs,
+                    socket_timeout=self.socket_timeout,
+                    socket_connect_timeout=self.socket_connect_timeout,
+                    socket_keepalive=self.socket_keepalive,
                     retry_on_timeout=True,
-                    health_check_interval=30,
+                    health_check_interval=self.health_check_interval,
+                    **ssl_options,
                 )
+                self._client = CustomRedis(connection_pool=pool)
                 # Проверяем подключение
                 await self._client.ping()
                 logger.info("Redis подключен успешно")
@@ -47,7 +78,7 @@ class RedisClient:
     async def close(self):
         """Закрывает подключение к Redis."""
         if self._client:
-            await self._client.close()
+            await self._client.aclose(close_connection_pool=True)
             self._client = None
             logger.info("Redis соединение закрыто")
 
@@ -57,6 +88,21 @@ class RedisClient:
             raise RuntimeError("Redis клиент не инициализирован. Проверьте lifespan.")
         return self._client
 
+    def pool_stats(self) -> Optional[Dict[str, int]]:
+        """Состояние пула соединений или None, если клиент не подключен."""
+        pool = self._client.connection_pool if self._client else None
+        return pool.stats() if isinstance(pool, InstrumentedConnectionPool) else None
+
+    def stats(self) -> Dict[str, Any]:
+        """
+        Состояние пула и метрики клиента.
+
+        Задержка команды включает ожидание соединения из пула, которое
+        дополнительно учитывается отдельно в pool_wait. Корзины задержек
+        доступны в /metrics.
+        """
+        return {"pool": self.pool_stats(), **self.metrics.snapshot()}
+
     async def __aenter__(self):
         """Поддерживает асинхронный контекстный менеджер."""
         await self.connect()
@@ -0,0 +1,87 @@
+import hashlib
+from bisect import bisect
+from typing import Any, Dict, List, Tuple
+from app.redis_dao.custom_redis import CustomRedis
+from app.redis_dao.redis_client import RedisClient
+
+
+class HashRing:
+    """Кольцо консистентного хэширования с виртуальными узлами."""
+
+    def __init__(self, nodes: List[str], replicas: int = 100):
+        if not nodes:
+            raise ValueError("Нужен хотя бы один узел")
+        self.nodes = list(nodes)
+        self._ring: List[Tuple[int, str]] = sorted(
+            (self._hash(f"{node}#{replica}"), node)
+            for node in self.nodes
+            for replica in range(replicas)
+        )
+        self._points = [point for point, _ in self._ring]
+
+    @staticmethod
+    def _hash(value: str) -> int:
+        return int.from_bytes(hashlib.md5(value.encode()).digest()[:8], "big")
+
+    def node_for(self, key: str) -> str:
+        """Возвращает узел, которому принадлежит ключ."""
+        if len(self.nodes) == 1:
+            return self.nodes[0]
+        index = bisect(self._points, self._hash(key)) % len(self._ring)
+        return self._ring[index][1]
+
+
+class ShardedRedis:
+    """
+    Набор узлов Redis, между которыми ключи распределяются по кольцу
+    консистентного хэширования.
+
+    При добавлении узла переезжает лишь небольшая доля ключей. С одним узлом
+    все ключи принадлежат ему и маршрутизация ничего не стоит.
+    """
+
+    def __init__(self, nodes: Dict[str, RedisClient], replicas: int = 100):
+        self.nodes = nodes
+        self.ring = HashRing(list(nodes), replicas=replicas)
+
+    @property
+    def is_single(self) -> bool:
+        """True, если все ключи находятся на одном узле."""
+        return len(self.nodes) == 1
+
+    async def connect(self):
+        """Подключается ко всем узлам."""
+        for node in self.nodes.values():
+            await node.connect()
+
+    async def close(self):
+        """Закрывает подключения ко всем узлам."""
+        for node in self.nodes.values():
+            await node.close()
+
+    def node_for(self, key: str) -> str:
+        """Возвращает имя узла, которому принадлежит ключ."""
+        return self.ring.node_for(key)
+
+    def client_for(self, key: str) -> CustomRedis:
+        """Возвращает клиент узла, которому принадлежит ключ."""
+        return self.nodes[self.ring.node_for(key)].get_client()
+
+    def client(self, node: str) -> CustomRedis:
+        """Возвращает клиент узла по имени."""
+        return self.nodes[node].get_client()
+
+    def clients(self) -> List[CustomRedis]:
+        """Возвращает клиенты всех узлов."""
+        return [node.get_client() for node in self.nodes.values()]
+
+    def stats(self) -> Dict[str, Any]:
+        """Состояние пулов и метрики клиентов всех узлов."""
+        return {name: node.stats() for name, node in self.nodes.items()}
+
+    def group_by_node(self, keys: List[str]) -> Dict[str, List[str]]:
+        """Раскладывает ключи по узлам, которым они принадлежат."""
+        groups: Dict[str, List[str]] = {}
+        for key in keys:
+            groups.setdefault(self.ring.node_for(key), []).append(key)
+        return groups
@@ -0,0 +1,104 @@
+"""
+Бенчмарк индекса совместимости MatchingEngine против линейного перебора is_match.
+
+Заполняет очередь ожидания 100 000 пользователей со случайными профилями,
+для каждого запроса сверяет результат индекса с линейным перебором (самый
+давний ожидающий, для которого is_match истинно) и сравнивает время поиска.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_matching --waiters 100000 --queries 1000
+"""
+import benchmarks.env  # noqa: F401
+import argparse
+import random
+import time
+from app.api.matching import FIND_GENDERS, GENDERS, MatchingEngine
+from app.api.utils import is_match
+
+
+
+def random_profile(rnd: random.Random, user_id: int) -> dict:
+    age_from = rnd.randint(18, 50)
+    return {
+        "user_id": user_id,
+        "gender": rnd.choice(GENDERS),
+        "find_gender": rnd.choice(FIND_GENDERS),
+        "age": rnd.randint(18, 70),
+        "age_from": age_from,
+        "age_to": age_from + rnd.randint(0, 30),
+    }
+
+
+def linear_find(waiters: list, seeker: dict):
+    """Прежний способ: перебор всех ожидающих в порядке прихода."""
+    for waiter in waiters:
+        if waiter["user_id"] != seeker["user_id"] and is_match(
+            user_gender=seeker["gender"],
+            user_find_gender=seeker["find_gender"],
+            user_age=seeker["age"],
+            user_age_from=seeker["age_from"],
+            user_age_to=seeker["age_to"],
+            partner_gender=waiter["gender"],
+            partner_find_gender=waiter["find_gender"],
+            partner_age=waiter["age"],
+            partner_age_from=waiter["age_from"],
+            partner_age_to=waiter["age_to"],
+        ):
+            return waiter
+    return None
+
+
+def main(args: argparse.Namespace):
+    rnd = random.Random(args.seed)
+    waiters = [random_profile(rnd, user_id) for user_id in range(args.waiters)]
+    engine = MatchingEngine()
+
+    started = time.perf_counter()
+    for waiter in waiters:
+        engine.add(**waiter)
+    print(f"Добавление {args.waiters} ожидающих: {time.perf_counter() - started:.2f}с")
+
+    seekers = [
+        random_profile(rnd, args.waiters + i) for i in range(args.queries)
+    ]
+    # Худший случай для перебора: возраст 17 не принимает никто из ожидающих
+    hopeless = [
+        {**seeker, "age": 17} for seeker in seekers[: max(args.queries // 10, 1)]
+    ]
+
+    mismatches = 0
+    for title, queries in (("Случайные запросы", seekers), ("Без пары", hopeless)):
+        started = time.perf_counter()
+        expected = [linear_find(waiters, seeker) for seeker in queries]
+        linear_time = time.perf_counter() - started
+
+        started = time.perf_counter()
+        found = [engine.find(**seeker) for seeker in queries]
+        engine_time = time.perf_counter() - started
+
+        mismatches += sum(
+            (e["user_id"] if e else None) != (f.user_id if f else None)
+            for e, f in zip(expected, found)
+        )
+        print(f"{title}:")
+        print(f"  линейный перебор: {linear_time / len(queries) * 1e3:8.3f} мс/поиск")
+        print(f"  MatchingEngine:   {engine_time / len(queries) * 1e3:8.3f} мс/поиск")
+    print(f"Расхождений с is_match: {mismatches}")
+
+    # Подбор с извлечением: каждый найденный уходит из очереди
+    started = time.perf_counter()
+    matched = sum(engine.pop_match(**seeker) is not None for seeker in seekers)
+    pop_time = time.perf_counter() - started
+    print(f"pop_match: {matched} пар, {pop_time / args.queries * 1e3:.3f} мс/поиск")
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--waiters", type=int, default=100_000)
+    parser.add_argument("--queries", type=int, default=1000)
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    main(parse_args())
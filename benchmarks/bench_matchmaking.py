@@ -0,0 +1,245 @@
+"""
+Нагрузочный бенчмарк подбора партнеров.
+
+Поднимает API-роутер приложения в процессе поверх временной базы SQLite и
+fakeredis (или локального redis-server, если передан --redis-url), заменяет
+Centrifugo заглушкой и прогоняет N пользователей со случайными полом,
+возрастом и предпочтениями. Каждый пользователь ищет партнера, опрашивает
+/api/room-status до появления пары и отправляет несколько сообщений.
+
+В отчете: p50/p95/p99 задержек find-partner, room-status и send-msg,
+количество пар в секунду и количество команд Redis на одну пару.
+
+Без --redis-url нужен fakeredis с поддержкой Lua (пакет lupa):
+    pip install -r requirements-dev.txt
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_matchmaking --users 2000 --concurrency 200
+    python -m benchmarks.bench_matchmaking --redis-url redis://localhost:6379/15
+    MATCH_ENGINE=memory python -m benchmarks.bench_matchmaking
+"""
+import benchmarks.env  # noqa: F401
+import argparse
+import asyncio
+import contextlib
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import defaultdict
+from typing import Dict, List, Tuple
+
+_db_dir = tempfile.mkdtemp(prefix="tetatet-bench-")
+os.environ["DB_URL"] = f"sqlite+aiosqlite:///{os.path.join(_db_dir, 'bench.sqlite3')}"
+
+import httpx
+from fastapi import FastAPI
+from loguru import logger
+from app.api.matching import FIND_GENDERS, GENDERS
+from app.api.router import router as api_router
+from app.centrifugo.manager import centrifugo_manager, centrifugo_publisher
+from app.dao.database import Base, async_session_maker, engine
+from app.dao.models import User
+from app.redis_dao.custom_redis import CustomRedis
+from app.redis_dao.manager import redis_manager
+
+
+
+class CommandCounterMixin:
+    """Считает команды, отправленные клиентом в Redis, включая команды конвейеров."""
+
+    commands = 0
+
+    async def execute_command(self, *args, **options):
+        self.commands += 1
+        return await super().execute_command(*args, **options)
+
+    def pipeline(self, transaction=True, shard_hint=None):
+        pipe = super().pipeline(transaction, shard_hint)
+        execute = pipe.execute
+
+        async def counted_execute(raise_on_error: bool = True):
+            self.commands += len(pipe.command_stack)
+            return await execute(raise_on_error)
+
+        pipe.execute = counted_execute
+        return pipe
+
+
+class CountingRedis(CommandCounterMixin, CustomRedis):
+    pass
+
+
+def make_redis(redis_url: str | None) -> CustomRedis:
+    if redis_url:
+        return CountingRedis.from_url(redis_url)
+
+    import fakeredis
+
+    class CountingFakeRedis(CommandCounterMixin, fakeredis.FakeAsyncRedis, CustomRedis):
+        pass
+
+    return CountingFakeRedis()
+
+
+def centrifugo_stub(request: httpx.Request) -> httpx.Response:
+    """Отвечает успехом на publish и на каждую команду batch-запроса."""
+    if request.url.path.endswith("/batch"):
+        commands = httpx.Response(200, content=request.content).json()["commands"]
+        return httpx.Response(200, json={"replies": [{"publish": {}} for _ in commands]})
+    return httpx.Response(200, json={"result": {}})
+
+
+async def create_users(count: int, rnd: random.Random) -> List[Tuple[int, str]]:
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.drop_all)
+        await conn.run_sync(Base.metadata.create_all)
+    users = [
+        User(
+            id=user_id,
+            nickname=f"user{user_id}",
+            gender=rnd.choice(GENDERS),
+            age=rnd.randint(18, 60),
+        )
+        for user_id in range(1, count + 1)
+    ]
+    profiles = [(user.id, user.nickname) for user in users]
+    async with async_session_maker() as session:
+        session.add_all(users)
+        await session.commit()
+    return profiles
+
+
+class Stats:
+    def __init__(self):
+        self.latencies: Dict[str, List[float]] = defaultdict(list)
+        self.matches = 0
+        self.unmatched = 0
+        self.errors = 0
+
+    async def call(self, name: str, request) -> httpx.Response:
+        started = time.perf_counter()
+        response = await request
+        self.latencies[name].append(time.perf_counter() - started)
+        if response.status_code != 200:
+            self.errors += 1
+        return response
+
+
+async def simulate_user(
+    client: httpx.AsyncClient,
+    user_id: int,
+    nickname: str,
+    args: argparse.Namespace,
+    rnd: random.Random,
+    stats: Stats,
+):
+    age_from = rnd.randint(18, 40)
+    request = {
+        "id": user_id,
+        "gender": rnd.choice(FIND_GENDERS),
+        "age_from": age_from,
+        "age_to": age_from + rnd.randint(5, 30),
+    }
+    response = await stats.call(
+        "find-partner", client.post("/api/find-partner", json=request)
+    )
+    room = response.json()
+    if room.get("status") == "matched":
+        stats.matches += 1
+    else:
+        deadline = time.perf_counter() + args.max_wait
+        while room.get("status") == "waiting" and time.perf_counter() < deadline:
+            await asyncio.sleep(args.poll_interval)
+            params = {"key": room["room_key"], "user_id": user_id}
+            response = await stats.call(
+                "room-status", client.get("/api/room-status", params=params)
+            )
+            room = {**room, "status": response.json().get("status")}
+        if room.get("status") != "matched":
+            stats.unmatched += 1
+            return
+
+    for _ in range(args.messages):
+        message = {"sender": nickname, "user_id": user_id, "message": "привет"}
+        await stats.call(
+            "send-msg", client.post(f"/api/send-msg/{room['room_key']}", json=message)
+        )
+
+
+def percentiles(values: List[float]) -> str:
+    if len(values) < 2:
+        return "недостаточно данных"
+    cuts = statistics.quantiles(values, n=100)
+    return "p50={:.2f}мс p95={:.2f}мс p99={:.2f}мс".format(
+        cuts[49] * 1000, cuts[94] * 1000, cuts[98] * 1000
+    )
+
+
+async def run(args: argparse.Namespace):
+    # Логи приложения искажают замеры и не должны попадать в log.txt
+    logger.remove()
+    rnd = random.Random(args.seed)
+    users = await create_users(args.users, rnd)
+
+    redis_client = make_redis(args.redis_url)
+    if args.redis_url:
+        await redis_client.flushdb()
+    # Кэш профилей и единственный узел redis_shards берут клиент из менеджера
+    redis_manager._client = redis_client
+
+    centrifugo_manager.transport = httpx.MockTransport(centrifugo_stub)
+    await centrifugo_manager.connect()
+    await centrifugo_publisher.start()
+
+    app = FastAPI()
+    app.include_router(api_router)
+
+    stats = Stats()
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def limited(user_id: int, nickname: str):
+        async with semaphore:
+            await simulate_user(client, user_id, nickname, args, rnd, stats)
+
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        started = time.perf_counter()
+        with contextlib.redirect_stdout(io.StringIO()):
+            await asyncio.gather(*(limited(*user) for user in users))
+        elapsed = time.perf_counter() - started
+
+    await centrifugo_publisher.stop()
+    await centrifugo_manager.close()
+    await redis_client.aclose()
+    await engine.dispose()
+
+    print(f"Пользователей: {args.users}, параллельно: {args.concurrency}, время: {elapsed:.2f}с")
+    for name in ("find-partner", "room-status", "send-msg"):
+        values = stats.latencies[name]
+        print(f"{name:>13}: {len(values):6d} запросов, {percentiles(values)}")
+    print(f"Пар: {stats.matches} ({stats.matches / elapsed:.1f}/с), без пары: {stats.unmatched}")
+    print(f"Ошибок: {stats.errors}")
+    if stats.matches:
+        print(
+            f"Команд Redis: {redis_client.commands} "
+            f"({redis_client.commands / stats.matches:.1f} на пару)"
+        )
+
+
+def parse_args() -> argparse.Namespace:
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[1])
+    parser.add_argument("--users", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=100)
+    parser.add_argument("--messages", type=int, default=3, help="сообщений на пользователя")
+    parser.add_argument("--poll-interval", type=float, default=0.05)
+    parser.add_argument("--max-wait", type=float, default=2.0, help="сколько ждать пару, сек")
+    parser.add_argument("--redis-url", default=None, help="локальный redis-server вместо fakeredis")
+    parser.add_argument("--seed", type=int, default=42)
+    return parser.parse_args()
+
+
+if __name__ == "__main__":
+    asyncio.run(run(parse_args()))
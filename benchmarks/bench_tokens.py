@@ -0,0 +1,41 @@
+"""
+Микробенчмарк выдачи токенов Centrifugo в find_partner.
+
+Сравнивает подпись нового JWT на каждый запрос (прежнее поведение) с
+переиспользованием токена из кэша get_client_token.
+
+Запуск из корня проекта:
+    python -m benchmarks.bench_tokens
+"""
+import benchmarks.env  # noqa: F401
+import random
+import timeit
+from app.api.utils import generate_client_token, get_client_token
+from app.config import settings
+
+USERS = 1000
+REQUESTS = 100_000
+
+
+def sign_every_time(user_ids):
+    for user_id in user_ids:
+        generate_client_token(user_id, settings.SECRET_KEY)
+
+
+def reuse_cached(user_ids):
+    for user_id in user_ids:
+        get_client_token(user_id)
+
+
+def main():
+    user_ids = [random.randint(1, USERS) for _ in range(REQUESTS)]
+    for name, func in (("sign every time", sign_every_time), ("cached", reuse_cached)):
+        elapsed = min(timeit.repeat(lambda: func(user_ids), number=1, repeat=3))
+        print(
+            f"{name:>16}: {elapsed / REQUESTS * 1e6:7.2f} мкс/запрос, "
+            f"{REQUESTS / elapsed:,.0f} запросов/с"
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,26 @@
+"""
+Заглушки окружения для бенчмарков и тестов.
+
+Они не требуют .env: недостающие обязательные параметры заполняются
+заглушками до импорта приложения. Импортируйте этот модуль первым.
+"""
+
+import os
+
+STUB_ENV = {
+    "BOT_TOKEN": "123456:stub",
+    "ADMIN_IDS": "[]",
+    "BASE_URL": "http://localhost",
+    "REDIS_PORT": "6379",
+    "REDIS_PASSWORD": "",
+    "REDIS_HOST": "localhost",
+    "REDIS_SSL": "false",
+    "FRONT_URL": "http://localhost",
+    "SECRET_KEY": "stub-secret",
+    "CENTRIFUGO_API_KEY": "stub",
+    "CENTRIFUGO_URL": "http://localhost:8000/api",
+    "SOCKET_URL": "ws://localhost:8000/connection/websocket",
+}
+
+for key, value in STUB_ENV.items():
+    os.environ.setdefault(key, value)
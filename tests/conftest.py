@@ -0,0 +1,9 @@
+"""Общие настройки тестов. Окружение заполняется заглушками из benchmarks.env."""
+
+import benchmarks.env  # noqa: F401
+import pytest
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
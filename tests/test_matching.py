@@ -0,0 +1,190 @@
+import random
+import pytest
+from app.api.matching import FIND_GENDERS, GENDERS, MAX_AGE, MatchingEngine
+from app.api.schemas import SPartner
+from app.api.utils import is_match
+
+
+
+def profile(user_id, gender="man", find_gender="any", age=30, age_from=18, age_to=60):
+    return {
+        "user_id": user_id,
+        "gender": gender,
+        "find_gender": find_gender,
+        "age": age,
+        "age_from": age_from,
+        "age_to": age_to,
+    }
+
+
+def linear_find(waiters, seeker):
+    """Самый давний ожидающий, для которого is_match истинно."""
+    for waiter in waiters:
+        if waiter["user_id"] != seeker["user_id"] and is_match(
+            user_gender=seeker["gender"],
+            user_find_gender=seeker["find_gender"],
+            user_age=seeker["age"],
+            user_age_from=seeker["age_from"],
+            user_age_to=seeker["age_to"],
+            partner_gender=waiter["gender"],
+            partner_find_gender=waiter["find_gender"],
+            partner_age=waiter["age"],
+            partner_age_from=waiter["age_from"],
+            partner_age_to=waiter["age_to"],
+        ):
+            return waiter
+    return None
+
+
+def found_id(waiter):
+    return waiter.user_id if waiter else None
+
+
+def random_profile(rnd, user_id):
+    age_from = rnd.choice([0, rnd.randint(10, 60)])
+    return profile(
+        user_id,
+        gender=rnd.choice(GENDERS),
+        find_gender=rnd.choice(FIND_GENDERS),
+        age=rnd.randint(10, 130),
+        age_from=age_from,
+        age_to=rnd.choice([999, age_from + rnd.randint(0, 40)]),
+    )
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_find_agrees_with_is_match(seed):
+    rnd = random.Random(seed)
+    waiters = [random_profile(rnd, user_id) for user_id in range(300)]
+    engine = MatchingEngine()
+    for waiter in waiters:
+        engine.add(**waiter)
+
+    for user_id in range(300, 600):
+        seeker = random_profile(rnd, user_id)
+        expected = linear_find(waiters, seeker)
+        assert found_id(engine.find(**seeker)) == (
+            expected["user_id"] if expected else None
+        )
+
+
+def test_pop_match_agrees_with_is_match_while_queue_changes():
+    rnd = random.Random(7)
+    waiters = []
+    engine = MatchingEngine()
+    for user_id in range(1000):
+        seeker = random_profile(rnd, user_id)
+        expected = linear_find(waiters, seeker)
+        found = engine.pop_match(**seeker)
+        if expected is None:
+            assert found is None
+            waiters.append(seeker)
+            engine.add(**seeker)
+        else:
+            assert found_id(found) == expected["user_id"]
+            waiters.remove(expected)
+    assert len(engine) == len(waiters)
+
+
+@pytest.mark.parametrize(
+    "seeker, partner, expected",
+    [
+        (profile(1, "man", "woman"), profile(2, "woman", "man"), True),
+        (profile(1, "man", "woman"), profile(2, "woman", "any"), True),
+        (profile(1, "man", "woman"), profile(2, "woman", "woman"), False),
+        (profile(1, "man", "woman"), profile(2, "man", "any"), False),
+        (profile(1, age=30, age_from=40), profile(2, age=45), True),
+        (profile(1, age=30, age_from=40), profile(2, age=35), False),
+        (profile(1, age=30), profile(2, age=45, age_from=31), False),
+        (profile(1, age=20, age_from=20, age_to=20), profile(2, age=20, age_from=20, age_to=20), True),
+    ],
+)
+def test_single_pair_matches_is_match(seeker, partner, expected):
+    engine = MatchingEngine()
+    engine.add(**partner)
+    assert (linear_find([partner], seeker) is not None) is expected
+    assert (engine.find(**seeker) is not None) is expected
+
+
+def test_oldest_compatible_waiter_wins():
+    engine = MatchingEngine()
+    engine.add(**profile(1, age=50))
+    engine.add(**profile(2, age=25))
+    engine.add(**profile(3, age=40))
+    assert engine.find(**profile(10, age_from=20, age_to=45)).user_id == 2
+    assert engine.find(**profile(10)).user_id == 1
+
+
+def test_user_never_matches_self():
+    engine = MatchingEngine()
+    engine.add(**profile(1))
+    assert engine.find(**profile(1)) is None
+
+    engine.add(**profile(2))
+    assert engine.find(**profile(1)).user_id == 2
+    assert engine.pop_match(**profile(1)).user_id == 2
+    assert 1 in engine and 2 not in engine
+
+
+def test_matched_waiter_is_removed():
+    engine = MatchingEngine()
+    engine.add(**profile(1), room_key="any_1")
+    engine.add(**profile(2), room_key="any_2")
+
+    assert engine.pop_match(**profile(10)).user_id == 1
+    assert 1 not in engine
+    assert engine.pop_match(**profile(11)).user_id == 2
+    assert engine.pop_match(**profile(12)) is None
+    assert len(engine) == 0
+
+
+def test_cancelled_waiter_is_removed():
+    engine = MatchingEngine()
+    engine.add(**profile(1), room_key="any_1")
+    engine.add(**profile(2), room_key="any_2")
+
+    assert engine.remove(1)
+    assert not engine.remove(1)
+    assert engine.find(**profile(10)).user_id == 2
+
+    assert engine.remove_room("any_2")
+    assert not engine.remove_room("any_2")
+    assert engine.find(**profile(10)) is None
+
+
+def test_add_replaces_previous_entry():
+    engine = MatchingEngine()
+    engine.add(**profile(1, age=30), room_key="any_old")
+    engine.add(**profile(2, age=30))
+    engine.add(**profile(1, age=70), room_key="any_new")
+
+    assert len(engine) == 2
+    assert not engine.remove_room("any_old")
+    # Повторная постановка в очередь ставит пользователя в ее конец
+    assert engine.find(**profile(10, age_from=18, age_to=99)).user_id == 2
+    assert engine.find(**profile(10, age_from=60, age_to=99)).user_id == 1
+
+
+def test_age_range_above_indexed_ages():
+    engine = MatchingEngine()
+    engine.add(**profile(1, age=30, age_from=100, age_to=200))
+    engine.add(**profile(2, age=150, age_from=18, age_to=60))
+
+    # Возраст за пределами индекса находит ожидающего с широким диапазоном
+    assert engine.find(**profile(10, age=150, age_from=18, age_to=60)).user_id == 1
+    # И ожидающий с возрастом за пределами индекса находится по диапазону
+    assert engine.find(**profile(11, age=30, age_from=MAX_AGE, age_to=999)).user_id == 2
+    assert engine.find(**profile(12, age=30, age_from=18, age_to=MAX_AGE)) is None
+
+
+def test_default_age_range_accepts_everyone():
+    defaults = SPartner(id=10)
+    assert defaults.age_to == 999
+
+    engine = MatchingEngine()
+    engine.add(**profile(1, age=18, age_from=defaults.age_from, age_to=defaults.age_to))
+    engine.add(**profile(2, age=99))
+
+    seeker = profile(10, age=45, age_from=defaults.age_from, age_to=defaults.age_to)
+    assert engine.pop_match(**seeker).user_id == 1
+    assert engine.pop_match(**seeker).user_id == 2
@@ -0,0 +1,139 @@
+import json
+import fakeredis
+import pytest
+from app.api import rooms
+from app.config import settings
+from app.redis_dao.custom_redis import CustomRedis
+from app.redis_dao.shards import ShardedRedis
+
+
+class FakeRedis(fakeredis.FakeAsyncRedis, CustomRedis):
+    pass
+
+
+class FakeNode:
+    def __init__(self):
+        self.client = FakeRedis()
+
+    def get_client(self):
+        return self.client
+
+
+@pytest.fixture
+def shards():
+    return ShardedRedis({"localhost:6379": FakeNode()})
+
+
+@pytest.fixture
+def memory_engine(monkeypatch):
+    monkeypatch.setattr(settings, "MATCH_ENGINE", "memory")
+    monkeypatch.setattr(rooms, "notify_matched", lambda room_key, partners: None)
+    rooms.matching_engine.clear()
+    yield rooms.matching_engine
+    rooms.matching_engine.clear()
+
+
+async def find(shards, user_id, gender="man", find_gender="any", age=30, age_from=0, age_to=999):
+    return await rooms.match_or_create_room(
+        shards,
+        user_id=user_id,
+        user_nickname=f"user{user_id}",
+        user_gender=gender,
+        user_age=age,
+        find_gender=find_gender,
+        age_from=age_from,
+        age_to=age_to,
+        user_token="token",
+    )
+
+
+@pytest.mark.anyio
+async def test_memory_engine_matches_waiting_room(shards, memory_engine):
+    result, room_key, count = await find(shards, 1)
+    assert (result, count) == ("waiting", 1)
+    assert 1 in memory_engine
+
+    # Повторный поиск возвращает ту же комнату
+    assert await find(shards, 1) == ("refund", room_key, 1)
+
+    # Неподходящий по полу пользователь не занимает комнату
+    result, other_key, _ = await find(shards, 2, gender="woman", find_gender="woman")
+    assert result == "waiting" and other_key != room_key
+    result, matched_key, count = await find(shards, 3)
+    assert (result, matched_key, count) == ("matched", room_key, 2)
+    assert 1 not in memory_engine
+
+    summary = await rooms.get_room_summary(shards, room_key)
+    assert [p["id"] for p in summary["partners"]] == [1, 3]
+
+
+@pytest.mark.anyio
+async def test_memory_engine_forgets_deleted_and_expired_rooms(shards, memory_engine):
+    _, cancelled_key, _ = await find(shards, 1)
+    await rooms.delete_room(shards, cancelled_key)
+    assert 1 not in memory_engine
+
+    _, expired_key, _ = await find(shards, 2)
+    await shards.client_for(rooms.room_redis_key(expired_key)).delete(
+        rooms.room_redis_key(expired_key)
+    )
+    # Комната истекла: ищущий не занимает ее, а создает свою
+    result, room_key, _ = await find(shards, 3)
+    assert result == "waiting" and room_key != expired_key
+    assert 2 not in memory_engine and 3 in memory_engine
+
+
+@pytest.mark.anyio
+async def test_fill_matching_engine_restores_queue_order(shards, memory_engine):
+    _, first_key, _ = await find(shards, 1, find_gender="woman", age=35)
+    await find(shards, 2, find_gender="woman", age=25)
+    memory_engine.clear()
+
+    assert await rooms.fill_matching_engine(shards) == 2
+    result, room_key, _ = await find(shards, 3, gender="woman")
+    assert (result, room_key) == ("matched", first_key)
+
+
+def legacy_room(room_key, partners):
+    """Комната в формате до перевода в хэши: строка JSON без TTL и индекса."""
+    return json.dumps(
+        {
+            "partners": [
+                {
+                    "id": user_id,
+                    "nickname": f"user{user_id}",
+                    "gender": "man",
+                    "age": 30,
+                    "find_gender": "any",
+                    "age_from": 0,
+                    "age_to": 999,
+                    "token": "token",
+                }
+                for user_id in partners
+            ],
+            "created_at": "2024-01-01T00:00:00",
+            "room_key": room_key,
+        }
+    )
+
+
+@pytest.mark.anyio
+async def test_migrations_index_legacy_waiting_rooms(shards, monkeypatch):
+    monkeypatch.setattr(rooms, "notify_matched", lambda room_key, partners: None)
+    redis_client = shards.client_for("any")
+    await redis_client.set("man_waiting", legacy_room("man_waiting", [1]))
+    await redis_client.set("any_full", legacy_room("any_full", [2, 3]))
+
+    await rooms.run_migrations(shards)
+    assert await rooms.run_migrations(shards) == []
+
+    waiting_key = rooms.room_redis_key("man_waiting")
+    index_key = rooms.waiting_index_key("man", "any", rooms.age_band(30))
+    assert 0 < await redis_client.ttl(waiting_key) <= settings.ROOM_TTL
+    assert 0 < await redis_client.ttl(rooms.room_redis_key("any_full"))
+    assert await redis_client.hget(waiting_key, "index") == index_key.encode()
+    assert await redis_client.zscore(index_key, waiting_key) == 30
+    assert await redis_client.hget(rooms.room_redis_key("any_full"), "index") is None
+
+    result, room_key, count = await find(shards, 4)
+    assert (result, room_key, count) == ("matched", "man_waiting", 2)